@@ -1,14 +1,20 @@
 import base64
 import os
+from functools import lru_cache
 from langchain_google_vertexai import VertexAI, VertexAIImageGeneratorChat
 from langchain_core.messages import HumanMessage, AIMessage
 from langchain_core.prompts import PromptTemplate
-from PIL import Image
-import io
 
-prompt_expander = VertexAI(model_name="gemini-pro")
+@lru_cache(maxsize=1)
+def get_prompt_expander() -> VertexAI:
+    # Built on first use and reused, instead of at import time
+    return VertexAI(model_name="gemini-pro")
+
+
+@lru_cache(maxsize=1)
+def get_image_generator() -> VertexAIImageGeneratorChat:
+    return VertexAIImageGeneratorChat(model_name="imagegeneration@006")
 
-image_generator = VertexAIImageGeneratorChat(model_name="imagegeneration@006")
 
 def generate_professional_ad_image(user_idea: str):
     print(f"1. User Idea: {user_idea}")
@@ -23,23 +29,24 @@ def generate_professional_ad_image(user_idea: str):
     Detailed Prompt:
     """
     prompt_template = PromptTemplate(template=refinement_template, input_variables=["idea"])
-    chain = prompt_template | prompt_expander
+    chain = prompt_template | get_prompt_expander()
     
     refined_prompt = chain.invoke({"idea": user_idea})
     print(f"2. Refined Prompt: {refined_prompt}")
 
     print("3. Generating Image (this may take a few seconds)...")
     messages = [HumanMessage(content=refined_prompt)]
-    response = image_generator.invoke(messages)
+    response = get_image_generator().invoke(messages)
 
     try:
         img_base64 = response.content[0]["image_url"]["url"].split(",")[-1] 
         
+        # The API already returns a PNG - write it as-is instead of a PIL round-trip
         image_data = base64.b64decode(img_base64)
-        image = Image.open(io.BytesIO(image_data))
         
         output_path = "static/processed/generated_ad_background.png"
-        image.save(output_path)
+        with open(output_path, "wb") as f:
+            f.write(image_data)
         print(f"4. Success! Image saved to {output_path}")
         return output_path
         
@@ -1,22 +1,61 @@
 from pydantic import BaseModel, Field
 from typing import List, Dict, Any
+from functools import lru_cache
 from dotenv import load_dotenv
 import logging
 import os
+import threading
 
-load_dotenv()
-PROJECT_ID = os.getenv("GCP_PROJECT_ID")
-LOCATION = os.getenv("GCP_LOCATION")
-MODEL_ID = os.getenv("GEMINI_MODEL_ID")
 logger = logging.getLogger(__name__)
 
 _agent = None
 _agent_initialized = False
+_init_lock = threading.Lock()
+
+# Escape braces for ChatPromptTemplate in a single pass
+_BRACE_TBL = str.maketrans({"{": "{{", "}": "}}"})
 
 class ValidationOutput(BaseModel):
     canvas: str = Field(description="Updated HTML + CSS after validation")
     issues: List[Dict[str, Any]] = Field(description="List of validation issues found")
 
+@lru_cache(maxsize=32)
+def _build_prompt(model_cls):
+    """
+    Build the output parser and prompt template once per output model.
+    Format instructions come from a pydantic schema walk - no need to redo it.
+    """
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_core.output_parsers import JsonOutputParser
+    from app.agents.config import SYSTEM_PROMPT
+
+    parser = JsonOutputParser(pydantic_object=model_cls)
+    format_instructions = parser.get_format_instructions()
+
+    safe_instructions = format_instructions.translate(_BRACE_TBL)
+
+    prompt = ChatPromptTemplate.from_messages([
+        (
+            "system",
+            SYSTEM_PROMPT
+            + "\n\nFollow these output instructions:\n"
+            + safe_instructions
+        ),
+        ("human", "{canvas}")
+    ])
+    return prompt, parser
+
+
+@lru_cache(maxsize=32)
+def _build_chain(model_cls):
+    """Prompt | llm | parser chain for an output model, built once per model."""
+    from langchain.chat_models import init_chat_model
+
+    prompt, parser = _build_prompt(model_cls)
+    llm = init_chat_model(model="google_genai:gemini-2.5-flash-lite")
+    return prompt | llm | parser
+
+
 def init_agent():
     """
     Initialize the validation agent.
@@ -27,43 +66,29 @@ def init_agent():
     if _agent_initialized:
         return
     
-    # Check if we should skip agent initialization
-    if os.getenv("SKIP_VALIDATION_AGENT", "false").lower() == "true":
-        logger.info("⚠️ Skipping validation agent initialization (SKIP_VALIDATION_AGENT=true)")
-        _agent_initialized = True
-        return
-    
-    try:
-        from langchain.chat_models import init_chat_model
-        from langchain_core.prompts import ChatPromptTemplate
-        from langchain_core.output_parsers import JsonOutputParser
-        from app.agents.config import RULESET, SYSTEM_PROMPT
+    with _init_lock:
+        # Another thread may have finished initialising while we waited
+        if _agent_initialized:
+            return
+        
+        # Only read .env when the agent is actually being set up
+        load_dotenv()
+        
+        # Check if we should skip agent initialization
+        if os.getenv("SKIP_VALIDATION_AGENT", "false").lower() == "true":
+            logger.info("⚠️ Skipping validation agent initialization (SKIP_VALIDATION_AGENT=true)")
+            _agent_initialized = True
+            return
         
-        parser = JsonOutputParser(pydantic_object=ValidationOutput)
-        format_instructions = parser.get_format_instructions()
-
-        safe_instructions = format_instructions.replace("{", "{{").replace("}", "}}")
-
-        llm = init_chat_model(model="google_genai:gemini-2.5-flash-lite")
-
-        prompt = ChatPromptTemplate.from_messages([
-            (
-                "system",
-                SYSTEM_PROMPT
-                + "\n\nFollow these output instructions:\n"
-                + safe_instructions
-            ),
-            ("human", "{canvas}")
-        ])
-
-        _agent = prompt | llm | parser
-        _agent_initialized = True
-        logger.info("✅ Validation agent initialized successfully")
+        try:
+            _agent = _build_chain(ValidationOutput)
+            _agent_initialized = True
+            logger.info("✅ Validation agent initialized successfully")
         
-    except Exception as e:
-        logger.warning(f"⚠️ Could not initialize validation agent: {e}")
-        logger.info("Validation endpoint will not work, but remove-bg and generate will function.")
-        _agent_initialized = True  # Mark as attempted so we don't retry
+        except Exception as e:
+            logger.warning(f"⚠️ Could not initialize validation agent: {e}")
+            logger.info("Validation endpoint will not work, but remove-bg and generate will function.")
+            _agent_initialized = True  # Mark as attempted so we don't retry
 
 
 
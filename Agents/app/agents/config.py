@@ -1,20 +1,22 @@
+from functools import lru_cache
 from pathlib import Path
 import os
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 RULESET_PATH = BASE_DIR / "resources" / "ruleset.txt"
-SYSTEM_PROMPT_PATH = BASE_DIR / "resources" / "system_prompt.py"
 
-RULESET = RULESET_PATH.read_text()
 
-if SYSTEM_PROMPT_PATH.exists():
-    import importlib.util
-    spec = importlib.util.spec_from_file_location("system_prompt_module", SYSTEM_PROMPT_PATH)
-    if spec and spec.loader:
-        system_prompt_module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(system_prompt_module)
-        SYSTEM_PROMPT = system_prompt_module.SYSTEM_PROMPT
-    else:
-        SYSTEM_PROMPT = "You are a validation engine."
-else:
+@lru_cache(maxsize=1)
+def _ruleset() -> str:
+    """Read the ruleset once per process"""
+    return RULESET_PATH.read_text(encoding="utf-8")
+
+
+RULESET = _ruleset()
+
+# Regular import: goes through sys.modules and the cached .pyc instead of
+# building a fresh module spec from the file on every load
+try:
+    from app.resources.system_prompt import SYSTEM_PROMPT
+except ImportError:
     SYSTEM_PROMPT = "You are a validation engine."
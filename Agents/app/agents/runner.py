@@ -2,13 +2,38 @@
 Canvas Validation Runner - Complete Tesco Retail Media Compliance System
 Parses Fabric.js JSON and validates against ALL Tesco compliance rules (20+ rules)
 """
-from app.agents.builder import get_agent, is_agent_available
 from app.core.models import ValidationResponse
-from app.agents.config import RULESET
+import hashlib
+import html
 import json
 import re
 import logging
 import math
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+try:
+    # Optional google-re2: linear-time matching, no backtracking on user copy
+    import re2 as _keyword_engine
+except ImportError:
+    _keyword_engine = re
+
+try:
+    # Optional orjson: C parser for the canvas JSON on every request
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    # Optional pyahocorasick: one automaton pass reports every keyword in a text
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +42,9 @@ logger = logging.getLogger(__name__)
 SAFE_ZONES = {
     "9:16": {"topClear": 200, "bottomClear": 250}
 }
+SAFE_ZONE_ASPECT = 9 / 16
+SAFE_ZONE_TOP = SAFE_ZONES["9:16"]["topClear"]
+SAFE_ZONE_BOTTOM = SAFE_ZONES["9:16"]["bottomClear"]
 
 MIN_FONT_SIZES = {
     "social": 20,
@@ -36,6 +64,27 @@ DRINKAWARE_SAYS_MIN_HEIGHT = 12
 PACKSHOT_GAP_DOUBLE_DENSITY = 24
 PACKSHOT_GAP_SINGLE_DENSITY = 12
 
+# Recent validation results, keyed by canvas digest (autosaves and repeated
+# previews resubmit the same canvas)
+VALIDATION_CACHE_MAX_ENTRIES = 256
+# The HTML preview inlines every image src, often a multi-MB data URL, so the
+# cache is also capped by the total preview size, and a preview above the
+# per-entry limit is never cached
+VALIDATION_CACHE_MAX_CHARS = 64 * 1024 * 1024
+VALIDATION_CACHE_MAX_ENTRY_CHARS = 8 * 1024 * 1024
+
+# Fabric.js object types that carry text
+TEXT_TYPES = ('text', 'textbox', 'i-text')
+
+# Exact colour / name values, matched by set lookup
+BLACK_WHITE_COLORS = frozenset({'#000000', '#000', 'black', '#ffffff', '#fff', 'white', 'rgb(0,0,0)', 'rgb(255,255,255)'})
+WHITE_BACKGROUNDS = frozenset({'#ffffff', '#fff', 'white', 'rgb(255,255,255)'})
+BACKGROUND_IMAGE_NAMES = frozenset({'background', 'bg'})
+
+# Substring markers in element names / image sources
+VALUE_TILE_NAME_MARKERS = ('value_tile', 'valuetile', 'price_tile', 'clubcard_tile', 'new_tile')
+PEOPLE_KEYWORDS = ('person', 'people', 'human', 'face', 'model', 'portrait')
+
 # Copy restrictions - ALL HARD FAIL
 BLOCKED_KEYWORDS = [
     # T&Cs
@@ -59,6 +108,54 @@ BLOCKED_KEYWORDS = [
     "survey says", "according to survey", "studies show"
 ]
 
+
+def _compile_keywords(keywords, ignore_case: bool = False):
+    """Compile literal keywords into one alternation (RE2 when installed)"""
+    pattern = "|".join(map(re.escape, keywords))
+    if ignore_case:
+        # Inline flag - understood by both re and re2
+        pattern = f"(?i:{pattern})"
+    return _keyword_engine.compile(pattern)
+
+
+class KeywordSet:
+    """
+    Literal keywords matched in a single pass over each text.
+    Aho-Corasick automaton when pyahocorasick is installed, otherwise one
+    compiled alternation.
+    """
+
+    def __init__(self, keywords):
+        self.keywords = list(keywords)
+        self._rank = {kw: i for i, kw in enumerate(self.keywords)}
+        if ahocorasick is not None:
+            self._automaton = ahocorasick.Automaton()
+            for kw in self.keywords:
+                self._automaton.add_word(kw, kw)
+            self._automaton.make_automaton()
+        else:
+            self._automaton = None
+            self._pattern = _compile_keywords(self.keywords)
+
+    def search(self, text: str) -> bool:
+        """True if any keyword occurs in text"""
+        if self._automaton is not None:
+            return next(self._automaton.iter(text), None) is not None
+        return self._pattern.search(text) is not None
+
+    def first(self, text: str):
+        """The earliest-listed keyword occurring in text, or None"""
+        if self._automaton is not None:
+            found = {kw for _, kw in self._automaton.iter(text)}
+            return min(found, key=self._rank.__getitem__) if found else None
+        if not self._pattern.search(text):
+            return None
+        return next(kw for kw in self.keywords if kw in text)
+
+
+# All blocked keywords in one matcher - a single scan per text
+_BLOCKED_KEYWORDS = KeywordSet(BLOCKED_KEYWORDS)
+
 # Allowed Tesco tag texts - ONLY these are permitted
 ALLOWED_TESCO_TAGS = [
     "only at tesco",
@@ -68,6 +165,7 @@ ALLOWED_TESCO_TAGS = [
     # Clubcard variant
     "available in selected stores. clubcard/app required. ends"
 ]
+_TESCO_TAGS = KeywordSet(ALLOWED_TESCO_TAGS)
 
 # LEP (Low Everyday Price) requirements
 LEP_REQUIRED_TAG = "selected stores. while stocks last"
@@ -77,14 +175,69 @@ VALUE_TILE_TYPES = ["new", "white", "clubcard"]
 
 # CTA is NOT allowed
 CTA_KEYWORDS = ["shop now", "buy now", "click here", "learn more", "find out more", "order now", "get it now"]
+_CTA_KEYWORDS = KeywordSet(CTA_KEYWORDS)
+
+
+class KeywordGroups:
+    """
+    Several keyword sets scanned together, so each text is read once for all
+    of them (one automaton pass when pyahocorasick is installed).
+    """
+
+    def __init__(self, *keyword_sets):
+        self.keyword_sets = keyword_sets
+        if ahocorasick is None:
+            self._automaton = None
+            return
+        entries = {}
+        for group, keyword_set in enumerate(keyword_sets):
+            for rank, kw in enumerate(keyword_set.keywords):
+                entries.setdefault(kw, []).append((group, rank))
+        self._automaton = ahocorasick.Automaton()
+        for kw, hits in entries.items():
+            self._automaton.add_word(kw, (kw, tuple(hits)))
+        self._automaton.make_automaton()
+
+    def first(self, text: str) -> list:
+        """KeywordSet.first for every group, in group order"""
+        if self._automaton is None:
+            return [keyword_set.first(text) for keyword_set in self.keyword_sets]
+        best = [None] * len(self.keyword_sets)
+        best_rank = [0] * len(self.keyword_sets)
+        for _, (kw, hits) in self._automaton.iter(text):
+            for group, rank in hits:
+                if best[group] is None or rank < best_rank[group]:
+                    best[group] = kw
+                    best_rank[group] = rank
+        return best
+
+
+# Tag / blocked / CTA keywords, read once per text while classifying
+_TEXT_KEYWORDS = KeywordGroups(_TESCO_TAGS, _BLOCKED_KEYWORDS, _CTA_KEYWORDS)
+
+# Alcohol campaign detection (Drinkaware rule)
+ALCOHOL_KEYWORDS = ['beer', 'wine', 'spirit', 'vodka', 'whisky', 'gin', 'rum', 'alcohol', 'lager', 'ale', 'cider']
+_ALCOHOL_RE = _compile_keywords(ALCOHOL_KEYWORDS, ignore_case=True)
+_DRINKAWARE_RE = _compile_keywords(["drinkaware"], ignore_case=True)
+_LEP_RE = _compile_keywords(["low everyday price", "lep"], ignore_case=True)
+
+# Clubcard end date in DD/MM form
+_CLUBCARD_DATE_RE = re.compile(r'\d{1,2}/\d{1,2}')
+
+# Name / src / customId markers, matched against already-lowercased values
+_VALUE_TILE_NAME_RE = _compile_keywords(VALUE_TILE_NAME_MARKERS)
+_PEOPLE_RE = _compile_keywords(PEOPLE_KEYWORDS)
+_TAG_CUSTOM_ID_RE = _compile_keywords(['tesco', 'only-at', 'available-at'])
 
 
 # ==================== HARDCODED POSITIONS CALCULATOR ====================
 
+@lru_cache(maxsize=32)
 def get_hardcoded_positions(canvas_width: int, canvas_height: int) -> dict:
     """
     Calculate HARDCODED positions for all elements based on canvas dimensions.
     These positions ensure NO OVERLAP between elements.
+    Cached per canvas size (up to five rules ask per validation) - treat the result as read-only.
     """
     # Padding from edges
     EDGE_PADDING = 20
@@ -142,24 +295,65 @@ def get_hardcoded_positions(canvas_width: int, canvas_height: int) -> dict:
 
 # ==================== HELPER FUNCTIONS ====================
 
+# Canvases reuse a handful of colours, so parses and luminances are memoised
+@lru_cache(maxsize=256)
 def hex_to_rgb(hex_color: str) -> tuple:
     """Convert hex color to RGB tuple"""
     hex_color = hex_color.lstrip('#')
     if len(hex_color) == 3:
         hex_color = ''.join([c*2 for c in hex_color])
+    
+    # Usual case: one int() parse, then shift out the channels
+    rgb_hex = hex_color[:6]
+    if len(rgb_hex) == 6 and rgb_hex.isalnum() and rgb_hex[:2] not in ('0x', '0X'):
+        try:
+            value = int(rgb_hex, 16)
+        except ValueError:
+            return (0, 0, 0)
+        return ((value >> 16) & 0xFF, (value >> 8) & 0xFF, value & 0xFF)
+    
     try:
         return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
     except:
         return (0, 0, 0)
 
 
+def _linearize_channel(c) -> float:
+    """sRGB channel (0-255) to linear light, per the WCAG formula"""
+    c = c / 255
+    return c / 12.92 if c <= 0.03928 else ((c + 0.055) / 1.055) ** 2.4
+
+
+# Every 8-bit channel value linearised up front - a lookup instead of a ** 2.4
+_LINEAR_CHANNEL = tuple(_linearize_channel(c) for c in range(256))
+_LINEAR_CHANNEL_ARRAY = np.array(_LINEAR_CHANNEL, dtype=np.float64)
+
+
+def _linear(c) -> float:
+    if isinstance(c, int) and 0 <= c <= 255:
+        return _LINEAR_CHANNEL[c]
+    return _linearize_channel(c)
+
+
+@lru_cache(maxsize=256)
 def get_luminance(rgb: tuple) -> float:
     """Calculate relative luminance for WCAG contrast"""
-    def adjust(c):
-        c = c / 255
-        return c / 12.92 if c <= 0.03928 else ((c + 0.055) / 1.055) ** 2.4
     r, g, b = rgb
-    return 0.2126 * adjust(r) + 0.7152 * adjust(g) + 0.0722 * adjust(b)
+    return 0.2126 * _linear(r) + 0.7152 * _linear(g) + 0.0722 * _linear(b)
+
+
+def parse_hex_array(colors: list) -> np.ndarray:
+    """hex_to_rgb over a list of colours, as an (N, 3) integer array"""
+    return np.array([hex_to_rgb(c) for c in colors], dtype=np.int64).reshape(-1, 3)
+
+
+def get_luminance_array(rgb: np.ndarray) -> np.ndarray:
+    """get_luminance for every row of an (N, 3) RGB array"""
+    if rgb.size and (rgb.min() < 0 or rgb.max() > 255):
+        # Odd strings like '#-f-f-f' parse outside 0-255 - use the formula
+        return np.array([get_luminance(tuple(row)) for row in rgb.tolist()], dtype=np.float64)
+    linear = _LINEAR_CHANNEL_ARRAY[rgb]
+    return 0.2126 * linear[:, 0] + 0.7152 * linear[:, 1] + 0.0722 * linear[:, 2]
 
 
 def get_contrast_ratio(color1: str, color2: str) -> float:
@@ -181,7 +375,7 @@ def get_bounding_box(element: dict) -> dict:
     width = element.get('width', 100) * element.get('scaleX', 1)
     height = element.get('height', 50) * element.get('scaleY', 1)
     
-    if element.get('type') in ['text', 'textbox', 'i-text']:
+    if element.get('type') in TEXT_TYPES:
         font_size = element.get('fontSize', 16)
         text = element.get('text', '')
         width = max(width, len(text) * font_size * 0.6)
@@ -199,7 +393,7 @@ def is_color_black_or_white(color: str) -> bool:
     if not color:
         return False
     color = color.lower().strip()
-    return color in ['#000000', '#000', 'black', '#ffffff', '#fff', 'white', 'rgb(0,0,0)', 'rgb(255,255,255)']
+    return color in BLACK_WHITE_COLORS
 
 
 def check_overlap(box1: dict, box2: dict) -> bool:
@@ -208,13 +402,169 @@ def check_overlap(box1: dict, box2: dict) -> bool:
                 box1['y2'] < box2['y1'] or box1['y1'] > box2['y2'])
 
 
+def overlap_table(rows: np.ndarray, boxes: np.ndarray) -> np.ndarray:
+    """(M, N) check_overlap of every row against every box, by broadcasting"""
+    a, b = rows[:, None, :], boxes[None, :, :]
+    return ~((a[..., 2] < b[..., 0]) | (a[..., 0] > b[..., 2]) |
+             (a[..., 3] < b[..., 1]) | (a[..., 1] > b[..., 3]))
+
+
+@dataclass
+class CanvasObjects:
+    """
+    Canvas objects sorted by kind once per validation and shared by every rule,
+    instead of each rule re-filtering and re-lowercasing the full object list.
+    """
+    objects: list
+    texts: list          # text / textbox / i-text elements
+    images: list         # image elements
+    texts_lower: list    # (text or '').lower().strip(), parallel to texts
+    text_is_tag: list    # text contains an allowed Tesco tag, parallel to texts
+    text_blocked: list   # first blocked keyword in the text or None, parallel to texts
+    text_cta: list       # first CTA keyword in the text or None, parallel to texts
+    src_lower: list      # (src or '').lower(), parallel to images
+    src_tesco: list      # 'tesco' in src_lower, parallel to images
+    src_logo: list       # 'logo' in src_lower, parallel to images
+    src_sticker: list    # 'sticker' in src_lower, parallel to images
+    text_indices: list   # position in objects of each entry in texts
+    image_indices: list  # position in objects of each entry in images
+    other_indices: list  # position in objects of everything else (odd-cased types etc.)
+    boxes: np.ndarray    # (N, 4) x1, y1, x2, y2 per object, NaN where broken
+    box_dicts: list      # get_bounding_box per object, None where broken
+    broken: list         # indices of objects whose box could not be built
+    has_alcohol: bool    # some text names an alcoholic drink (Drinkaware rule)
+    is_lep: bool         # some text mentions LEP / Low Everyday Price
+    text_scan: Optional["TextScan"] = None  # filled by scan_text_elements
+
+    def bbox(self, index: int) -> dict:
+        """Bounding box of objects[index]"""
+        box = self.box_dicts[index]
+        if box is None:
+            # Malformed element - raise the same error as computing it directly
+            return get_bounding_box(self.objects[index])
+        return box
+
+    def bbox_array(self, indices) -> np.ndarray:
+        """Rows of boxes for the given objects"""
+        for i in self.broken:
+            if i in indices:
+                self.bbox(i)
+        return self.boxes[list(indices)]
+
+
+def classify_objects(objects: list) -> CanvasObjects:
+    """
+    Split canvas objects into text and image elements and compute every
+    bounding box in a single pass
+    """
+    texts, images, texts_lower, src_lower = [], [], [], []
+    src_tesco, src_logo, src_sticker = [], [], []
+    text_is_tag, text_blocked, text_cta = [], [], []
+    text_indices, image_indices, other_indices = [], [], []
+    boxes = np.full((len(objects), 4), np.nan)
+    box_dicts, broken = [], []
+    has_alcohol = is_lep = False
+    for i, o in enumerate(objects):
+        obj_type = o.get('type')
+        if obj_type in TEXT_TYPES:
+            raw_text = o.get('text') or ''
+            text = raw_text.lower().strip()
+            # Campaign probes - once one text matches, the rest needn't be searched
+            if not has_alcohol and _ALCOHOL_RE.search(raw_text):
+                has_alcohol = True
+            if not is_lep and _LEP_RE.search(raw_text):
+                is_lep = True
+            tag, blocked, cta = _TEXT_KEYWORDS.first(text)
+            texts.append(o)
+            texts_lower.append(text)
+            text_is_tag.append(tag is not None)
+            text_blocked.append(blocked)
+            text_cta.append(cta)
+            text_indices.append(i)
+        elif obj_type == 'image':
+            src = (o.get('src') or '').lower()
+            images.append(o)
+            src_lower.append(src)
+            src_tesco.append('tesco' in src)
+            src_logo.append('logo' in src)
+            src_sticker.append('sticker' in src)
+            image_indices.append(i)
+        else:
+            other_indices.append(i)
+        
+        # A malformed element only fails the rules that look at its box
+        try:
+            box = get_bounding_box(o)
+            boxes[i] = (box['x1'], box['y1'], box['x2'], box['y2'])
+        except (TypeError, ValueError):
+            box = None
+            broken.append(i)
+        box_dicts.append(box)
+    
+    return CanvasObjects(
+        objects, texts, images, texts_lower, text_is_tag, text_blocked, text_cta,
+        src_lower, src_tesco, src_logo, src_sticker,
+        text_indices, image_indices, other_indices, boxes, box_dicts, broken,
+        has_alcohol, is_lep,
+    )
+
+
+class TextScan(NamedTuple):
+    """Results of the shared text pass for the headline, subhead and tag-text rules"""
+    has_headline: bool
+    non_tag_texts: list         # text elements without an allowed Tesco tag
+    invalid_tesco_texts: list   # non-logo texts mentioning Tesco outside an allowed tag
+
+
+def scan_text_elements(canvas: CanvasObjects) -> TextScan:
+    """
+    Walk the text elements once for rules 2, 3 and 17, instead of once per rule.
+    The result is kept on the canvas view for the remaining rules.
+    """
+    if canvas.text_scan is not None:
+        return canvas.text_scan
+    
+    has_headline = False
+    non_tag_texts, invalid_tesco_texts = [], []
+    for el, text, is_tag in zip(canvas.texts, canvas.texts_lower, canvas.text_is_tag):
+        # Headline: any non-tag text at headline size (first match is enough)
+        if not has_headline:
+            font_size = el.get('fontSize', 16)
+            if font_size >= HEADLINE_MIN_FONT_SIZE and len(text) > 0 and not is_tag:
+                has_headline = True
+        
+        if not is_tag:
+            non_tag_texts.append(el)
+        
+        # Tag text: mentions Tesco but isn't an allowed tag, and isn't a logo
+        if el.get('isLogo') == True or 'logo' in (el.get('customId') or '').lower():
+            continue
+        if 'tesco' in text and not is_tag:
+            invalid_tesco_texts.append(el)
+    
+    canvas.text_scan = TextScan(has_headline, non_tag_texts, invalid_tesco_texts)
+    return canvas.text_scan
+
+
+def _loads_canvas(canvas_json: str):
+    """json.loads, through orjson when it is installed"""
+    if orjson is not None:
+        try:
+            return orjson.loads(canvas_json)
+        except orjson.JSONDecodeError:
+            # orjson refuses a few things the stdlib takes (NaN, Infinity,
+            # lone surrogates) - let json.loads have the final say
+            pass
+    return json.loads(canvas_json)
+
+
 def parse_fabric_canvas(canvas_json: str) -> dict:
     """Parse Fabric.js canvas JSON and extract elements"""
     try:
-        data = json.loads(canvas_json)
+        data = _loads_canvas(canvas_json)
     except json.JSONDecodeError:
         logger.error("Failed to parse canvas JSON")
-        return {"objects": [], "background": "#ffffff", "width": 1080, "height": 1920}
+        return {"objects": [], "background": "#ffffff", "background_luminance": 1.0, "width": 1080, "height": 1920}
     
     if isinstance(data, dict):
         objects = data.get('objects', [])
@@ -227,9 +577,14 @@ def parse_fabric_canvas(canvas_json: str) -> dict:
         width = 1080
         height = 1920
     
+    if not isinstance(background, str):
+        background = '#ffffff'
+    
     return {
         "objects": objects,
-        "background": background if isinstance(background, str) else '#ffffff',
+        "background": background,
+        # Parsed once here so the contrast rule only compares floats
+        "background_luminance": get_luminance(hex_to_rgb(background)),
         "width": width,
         "height": height
     }
@@ -237,38 +592,27 @@ def parse_fabric_canvas(canvas_json: str) -> dict:
 
 # ==================== ALL 20 TESCO VALIDATION RULES ====================
 
-def check_tesco_tag(objects: list, canvas_width: int = 1080, canvas_height: int = 1920) -> list:
+def check_tesco_tag(canvas: CanvasObjects, canvas_width: int = 1080, canvas_height: int = 1920, out: Optional[list] = None) -> list:
     """
     Rule 1: TESCO_TAG - Mandatory Tesco branding
     If creative links to Tesco, a Tesco tag is mandatory
     Checks for: text tags, logo images, sticker images, or custom properties
     """
-    violations = []
-    text_elements = [o for o in objects if o.get('type') in ['text', 'textbox', 'i-text']]
-    image_elements = [o for o in objects if o.get('type') == 'image']
-    
-    has_text_tag = False
-    for el in text_elements:
-        text = (el.get('text') or '').lower().strip()
-        if any(tag in text for tag in ALLOWED_TESCO_TAGS):
-            has_text_tag = True
-            break
+    violations = [] if out is None else out
+    
+    has_text_tag = any(canvas.text_is_tag)
     
     # Check for Tesco logo or sticker by src path
-    has_logo = any('tesco' in (el.get('src') or '').lower() and 'logo' in (el.get('src') or '').lower() 
-                   for el in image_elements)
+    has_logo = any(tesco and logo for tesco, logo in zip(canvas.src_tesco, canvas.src_logo))
     
-    has_sticker = any('sticker' in (el.get('src') or '').lower() and 'tesco' in (el.get('src') or '').lower()
-                      for el in image_elements)
+    has_sticker = any(sticker and tesco for sticker, tesco in zip(canvas.src_sticker, canvas.src_tesco))
     
     # Also check for custom properties set by frontend auto-fix
     has_custom_tag = any(
         el.get('isTescoTag') == True or 
         el.get('stickerType') == 'tesco-tag' or
-        'tesco' in (el.get('customId') or '').lower() or
-        'only-at' in (el.get('customId') or '').lower() or
-        'available-at' in (el.get('customId') or '').lower()
-        for el in objects
+        _TAG_CUSTOM_ID_RE.search((el.get('customId') or '').lower()) is not None
+        for el in canvas.objects
     )
     
     if not (has_text_tag or has_logo or has_sticker or has_custom_tag):
@@ -300,26 +644,15 @@ def check_tesco_tag(objects: list, canvas_width: int = 1080, canvas_height: int
     return violations
 
 
-def check_headline(objects: list, canvas_width: int = 1080, canvas_height: int = 1920) -> list:
+def check_headline(canvas: CanvasObjects, canvas_width: int = 1080, canvas_height: int = 1920, out: Optional[list] = None) -> list:
     """
     Rule 2: HEADLINE - Must have headline text
     Headline appears on all banners, minimum 24px
     AI should generate creative headline based on product - NOT placeholder text!
     """
-    violations = []
-    text_elements = [o for o in objects if o.get('type') in ['text', 'textbox', 'i-text']]
+    violations = [] if out is None else out
     
-    has_headline = False
-    for el in text_elements:
-        font_size = el.get('fontSize', 16)
-        text = (el.get('text') or '').strip()
-        is_tag = any(tag in text.lower() for tag in ALLOWED_TESCO_TAGS)
-        
-        if font_size >= HEADLINE_MIN_FONT_SIZE and len(text) > 0 and not is_tag:
-            has_headline = True
-            break
-    
-    if not has_headline:
+    if not scan_text_elements(canvas).has_headline:
         # Get HARDCODED positions based on canvas size
         positions = get_hardcoded_positions(canvas_width, canvas_height)
         headline_pos = positions["headline"]
@@ -357,20 +690,15 @@ def check_headline(objects: list, canvas_width: int = 1080, canvas_height: int =
     return violations
 
 
-def check_subhead(objects: list, canvas_width: int = 1080, canvas_height: int = 1920) -> list:
+def check_subhead(canvas: CanvasObjects, canvas_width: int = 1080, canvas_height: int = 1920, out: Optional[list] = None) -> list:
     """
     Rule 3: SUBHEAD - Subhead appears on all banners
     AI should generate creative subheadline - NOT placeholder text!
     """
-    violations = []
-    text_elements = [o for o in objects if o.get('type') in ['text', 'textbox', 'i-text']]
+    violations = [] if out is None else out
     
     # Check for at least 2 text elements (headline + subhead)
-    non_tag_texts = []
-    for el in text_elements:
-        text = (el.get('text') or '').strip().lower()
-        if not any(tag in text for tag in ALLOWED_TESCO_TAGS):
-            non_tag_texts.append(el)
+    non_tag_texts = scan_text_elements(canvas).non_tag_texts
     
     if len(non_tag_texts) < 2:
         # Get HARDCODED positions based on canvas size
@@ -410,16 +738,15 @@ def check_subhead(objects: list, canvas_width: int = 1080, canvas_height: int =
     return violations
 
 
-def check_min_font_size(objects: list, format_type: str = "social") -> list:
+def check_min_font_size(canvas: CanvasObjects, format_type: str = "social", out: Optional[list] = None) -> list:
     """
     Rule 4: MIN_FONT_SIZE - Accessibility requirement
     Brand / Checkout Double / Social: 20px | Checkout Single: 10px | SAYS: 12px
     """
-    violations = []
+    violations = [] if out is None else out
     min_size = MIN_FONT_SIZES.get(format_type, MIN_FONT_SIZES["default"])
-    text_elements = [o for o in objects if o.get('type') in ['text', 'textbox', 'i-text']]
     
-    for el in text_elements:
+    for el in canvas.texts:
         font_size = el.get('fontSize', 16)
         el_id = el.get('id', 'unknown')
         
@@ -436,159 +763,177 @@ def check_min_font_size(objects: list, format_type: str = "social") -> list:
     return violations
 
 
-def check_safe_zones(objects: list, canvas_width: int, canvas_height: int) -> list:
+def check_safe_zones(canvas: CanvasObjects, canvas_width: int, canvas_height: int, out: Optional[list] = None) -> list:
     """
     Rule 5: SAFE_ZONE - Social safe zones (9:16 format)
     Top 200px and bottom 250px must be free of text/logos
     """
-    violations = []
+    violations = [] if out is None else out
     
     aspect_ratio = canvas_width / canvas_height
-    is_916 = abs(aspect_ratio - (9/16)) < 0.05
+    is_916 = abs(aspect_ratio - SAFE_ZONE_ASPECT) < 0.05
     
     if not is_916:
         return violations
     
-    safe_zones = SAFE_ZONES["9:16"]
-    
-    # Check text elements and logos
-    check_elements = [o for o in objects if o.get('type', '').lower() in ['text', 'textbox', 'i-text']]
+    # Check text elements (any type casing) and logos. Lowercase text types
+    # are already bucketed; only the leftover objects need their type folded
+    objects = canvas.objects
+    check_indices = list(canvas.text_indices)
+    odd_cased = [i for i in canvas.other_indices if objects[i].get('type', '').lower() in TEXT_TYPES]
+    if odd_cased:
+        check_indices = sorted(check_indices + odd_cased)
     
     # Also check logo images
-    logo_images = [o for o in objects if o.get('type') == 'image' and 'logo' in (o.get('src') or '').lower()]
-    check_elements.extend(logo_images)
+    check_indices.extend(i for i, logo in zip(canvas.image_indices, canvas.src_logo) if logo)
+    
+    if not check_indices:
+        return violations
+    
+    bottom_limit = canvas_height - SAFE_ZONE_BOTTOM
     
-    for el in check_elements:
-        box = get_bounding_box(el)
+    # Screen every element edge straight from the precomputed box rows;
+    # only the (usually few) violators are visited in Python
+    boxes = canvas.bbox_array(check_indices)
+    in_top = boxes[:, 1] < SAFE_ZONE_TOP
+    in_bottom = boxes[:, 3] > bottom_limit
+    
+    for i in np.flatnonzero(in_top | in_bottom):
+        el = objects[check_indices[i]]
         el_id = el.get('id', 'unknown')
         el_type = el.get('type', 'element')
         text_preview = (el.get('text') or el_type)[:20]
         
         # Top safe zone
-        if box['y1'] < safe_zones['topClear']:
+        if in_top[i]:
             violations.append({
                 "elementId": el_id,
                 "rule": "SAFE_ZONE",
                 "severity": "hard",
                 "message": f"'{text_preview}' is in top safe zone (top 200px must be clear)",
                 "autoFixable": True,
-                "autoFix": {"property": "top", "value": safe_zones['topClear'] + 10}
+                "autoFix": {"property": "top", "value": SAFE_ZONE_TOP + 10}
             })
         
         # Bottom safe zone
-        bottom_limit = canvas_height - safe_zones['bottomClear']
-        if box['y2'] > bottom_limit:
+        if in_bottom[i]:
             violations.append({
                 "elementId": el_id,
                 "rule": "SAFE_ZONE",
                 "severity": "hard",
                 "message": f"'{text_preview}' is in bottom safe zone (bottom 250px must be clear)",
                 "autoFixable": True,
-                "autoFix": {"property": "top", "value": bottom_limit - box['height'] - 10}
+                "autoFix": {"property": "top", "value": bottom_limit - canvas.bbox(check_indices[i])['height'] - 10}
             })
     
     return violations
 
 
-def check_contrast(objects: list, background: str) -> list:
+def check_contrast(canvas: CanvasObjects, background: str, bg_lum: Optional[float] = None, out: Optional[list] = None) -> list:
     """
     Rule 6: CONTRAST - WCAG AA compliance
     Must meet 4.5:1 contrast ratio for text
     """
-    violations = []
-    text_elements = [o for o in objects if o.get('type') in ['text', 'textbox', 'i-text']]
+    violations = [] if out is None else out
+    if bg_lum is None:
+        bg_lum = get_luminance(hex_to_rgb(background))
     
-    for el in text_elements:
+    fills, fill_elements = [], []
+    for el in canvas.texts:
         fill = el.get('fill', '#000000')
-        el_id = el.get('id', 'unknown')
-        
         if not fill or not isinstance(fill, str) or not fill.startswith('#'):
             continue
-        
-        ratio = get_contrast_ratio(fill, background)
-        
-        if ratio < WCAG_MIN_RATIO:
-            white_ratio = get_contrast_ratio('#ffffff', background)
-            black_ratio = get_contrast_ratio('#000000', background)
-            suggested = '#ffffff' if white_ratio > black_ratio else '#000000'
-            
-            violations.append({
-                "elementId": el_id,
-                "rule": "CONTRAST",
-                "severity": "hard",
-                "message": f"Contrast ratio {ratio:.1f}:1 is below WCAG minimum {WCAG_MIN_RATIO}:1",
-                "autoFixable": True,
-                "autoFix": {"property": "fill", "value": suggested}
-            })
+        fills.append(fill)
+        fill_elements.append(el)
+    
+    if not fills:
+        return violations
+    
+    # Every fill's ratio against the background in one array expression
+    fill_lum = get_luminance_array(parse_hex_array(fills))
+    ratios = (np.maximum(fill_lum, bg_lum) + 0.05) / (np.minimum(fill_lum, bg_lum) + 0.05)
+    
+    failing = np.flatnonzero(ratios < WCAG_MIN_RATIO)
+    if not failing.size:
+        return violations
+    
+    # White and black have luminance 1 and 0
+    white_ratio = (1.0 + 0.05) / (bg_lum + 0.05)
+    black_ratio = (bg_lum + 0.05) / (0.0 + 0.05)
+    suggested = '#ffffff' if white_ratio > black_ratio else '#000000'
+    
+    for i in failing:
+        ratio = float(ratios[i])
+        violations.append({
+            "elementId": fill_elements[i].get('id', 'unknown'),
+            "rule": "CONTRAST",
+            "severity": "hard",
+            "message": f"Contrast ratio {ratio:.1f}:1 is below WCAG minimum {WCAG_MIN_RATIO}:1",
+            "autoFixable": True,
+            "autoFix": {"property": "fill", "value": suggested}
+        })
     
     return violations
 
 
-def check_blocked_keywords(objects: list) -> list:
+def check_blocked_keywords(canvas: CanvasObjects, out: Optional[list] = None) -> list:
     """
     Rule 7: BLOCKED_COPY - Prohibited content
     T&Cs, competitions, sustainability claims, charity, price refs, money-back, claims
     """
-    violations = []
-    text_elements = [o for o in objects if o.get('type') in ['text', 'textbox', 'i-text']]
+    violations = [] if out is None else out
     
-    for el in text_elements:
-        text = (el.get('text') or '').lower()
+    for el, keyword in zip(canvas.texts, canvas.text_blocked):
         el_id = el.get('id', 'unknown')
         
-        for keyword in BLOCKED_KEYWORDS:
-            if keyword in text:
-                violations.append({
-                    "elementId": el_id,
-                    "rule": "BLOCKED_COPY",
-                    "severity": "hard",
-                    "message": f"Prohibited content: '{keyword}' - T&Cs, competitions, sustainability, charity, price refs not allowed",
-                    "autoFixable": False,
-                    "autoFix": None
-                })
-                break  # One violation per element
+        # One violation per element, reporting the first listed keyword found
+        if keyword is None:
+            continue
+        
+        violations.append({
+            "elementId": el_id,
+            "rule": "BLOCKED_COPY",
+            "severity": "hard",
+            "message": f"Prohibited content: '{keyword}' - T&Cs, competitions, sustainability, charity, price refs not allowed",
+            "autoFixable": False,
+            "autoFix": None
+        })
     
     return violations
 
 
-def check_cta_not_allowed(objects: list) -> list:
+def check_cta_not_allowed(canvas: CanvasObjects, out: Optional[list] = None) -> list:
     """
     Rule 8: NO_CTA - CTA buttons/text are NOT allowed
     """
-    violations = []
-    text_elements = [o for o in objects if o.get('type') in ['text', 'textbox', 'i-text']]
+    violations = [] if out is None else out
     
-    for el in text_elements:
-        text = (el.get('text') or '').lower()
+    for el, cta in zip(canvas.texts, canvas.text_cta):
         el_id = el.get('id', 'unknown')
         
-        for cta in CTA_KEYWORDS:
-            if cta in text:
-                violations.append({
-                    "elementId": el_id,
-                    "rule": "NO_CTA",
-                    "severity": "hard",
-                    "message": f"CTA text '{cta}' is not allowed in Tesco creatives",
-                    "autoFixable": False,
-                    "autoFix": None
-                })
-                break
+        if cta is not None:
+            violations.append({
+                "elementId": el_id,
+                "rule": "NO_CTA",
+                "severity": "hard",
+                "message": f"CTA text '{cta}' is not allowed in Tesco creatives",
+                "autoFixable": False,
+                "autoFix": None
+            })
     
     return violations
 
 
-def check_packshot(objects: list) -> list:
+def check_packshot(canvas: CanvasObjects, out: Optional[list] = None) -> list:
     """
     Rule 9: PACKSHOT - Maximum 3 packshots, lead product mandatory
     """
-    violations = []
-    image_elements = [o for o in objects if o.get('type') == 'image']
+    violations = [] if out is None else out
     
     # Filter product images (not logos/stickers)
     product_images = []
-    for el in image_elements:
-        src = (el.get('src') or '').lower()
-        if 'tesco' in src or 'logo' in src or 'sticker' in src:
+    for el, tesco, logo, sticker in zip(canvas.images, canvas.src_tesco, canvas.src_logo, canvas.src_sticker):
+        if tesco or logo or sticker:
             continue
         width = el.get('width', 0) * el.get('scaleX', 1)
         height = el.get('height', 0) * el.get('scaleY', 1)
@@ -618,56 +963,58 @@ def check_packshot(objects: list) -> list:
     return violations
 
 
-def check_packshot_safe_zone(objects: list) -> list:
+def check_packshot_safe_zone(canvas: CanvasObjects, out: Optional[list] = None) -> list:
     """
     Rule 10: PACKSHOT_GAP - Packshot spacing requirements
     Double density: 24px minimum gap | Single density: 12px minimum gap
     """
-    violations = []
-    image_elements = [o for o in objects if o.get('type') == 'image']
+    violations = [] if out is None else out
     
     # Find packshots
-    packshots = []
-    for el in image_elements:
-        src = (el.get('src') or '').lower()
-        if 'tesco' not in src and 'logo' not in src and 'sticker' not in src:
+    packshots, packshot_indices = [], []
+    for el, tesco, logo, sticker, index in zip(
+        canvas.images, canvas.src_tesco, canvas.src_logo, canvas.src_sticker, canvas.image_indices
+    ):
+        if not (tesco or logo or sticker):
             width = el.get('width', 0) * el.get('scaleX', 1)
             if width > 50:
                 packshots.append(el)
+                packshot_indices.append(index)
     
-    # Check gap between packshots
-    for i, ps in enumerate(packshots):
-        ps_box = get_bounding_box(ps)
-        for j, other in enumerate(packshots):
-            if i >= j:
-                continue
-            other_box = get_bounding_box(other)
-            
-            h_gap = max(0, max(ps_box['x1'] - other_box['x2'], other_box['x1'] - ps_box['x2']))
-            v_gap = max(0, max(ps_box['y1'] - other_box['y2'], other_box['y1'] - ps_box['y2']))
-            min_gap = min(h_gap, v_gap) if h_gap > 0 or v_gap > 0 else 0
-            
-            if check_overlap(ps_box, other_box) or min_gap < PACKSHOT_GAP_DOUBLE_DENSITY:
-                violations.append({
-                    "elementId": ps.get('id'),
-                    "rule": "PACKSHOT_GAP",
-                    "severity": "warning",
-                    "message": f"Packshots need minimum {PACKSHOT_GAP_DOUBLE_DENSITY}px gap between them",
-                    "autoFixable": True,
-                    "autoFix": {"property": "spacing", "value": PACKSHOT_GAP_DOUBLE_DENSITY}
-                })
-                break
+    if len(packshots) < 2:
+        return violations
+    
+    # Gap between every pair at once: (N, 1) against (1, N) broadcasts
+    x1, y1, x2, y2 = canvas.bbox_array(packshot_indices).T
+    dx = np.maximum(x1[:, None] - x2[None, :], x1[None, :] - x2[:, None])
+    dy = np.maximum(y1[:, None] - y2[None, :], y1[None, :] - y2[:, None])
+    h_gap = np.where(dx > 0, dx, 0)
+    v_gap = np.where(dy > 0, dy, 0)
+    
+    # Overlapping boxes have a zero gap on both axes, so this covers overlap too
+    too_close = np.triu(np.minimum(h_gap, v_gap) < PACKSHOT_GAP_DOUBLE_DENSITY, k=1)
+    
+    # One warning per packshot that is too close to a later one
+    for i in np.flatnonzero(too_close.any(axis=1)):
+        violations.append({
+            "elementId": packshots[i].get('id'),
+            "rule": "PACKSHOT_GAP",
+            "severity": "warning",
+            "message": f"Packshots need minimum {PACKSHOT_GAP_DOUBLE_DENSITY}px gap between them",
+            "autoFixable": True,
+            "autoFix": {"property": "spacing", "value": PACKSHOT_GAP_DOUBLE_DENSITY}
+        })
     
     return violations
 
 
-def check_value_tile(objects: list, canvas_width: int = 1080, canvas_height: int = 1920) -> list:
+def check_value_tile(canvas: CanvasObjects, canvas_width: int = 1080, canvas_height: int = 1920, out: Optional[list] = None) -> list:
     """
     Rule 11: VALUE_TILE - Value tile rules
     Types: New, White, Clubcard - Nothing may overlap the value tile
     Value tiles must be BIG (minimum 120x120px)
     """
-    violations = []
+    violations = [] if out is None else out
     
     # Get HARDCODED positions based on canvas size
     positions = get_hardcoded_positions(canvas_width, canvas_height)
@@ -679,13 +1026,13 @@ def check_value_tile(objects: list, canvas_width: int = 1080, canvas_height: int
     
     # Find value tiles by name or custom property
     value_tiles = []
-    for el in objects:
-        name = (el.get('name') or el.get('id') or '').lower()
-        if any(vt in name for vt in ['value_tile', 'valuetile', 'price_tile', 'clubcard_tile', 'new_tile']):
-            value_tiles.append(el)
+    is_tile_name = _VALUE_TILE_NAME_RE.search
+    for i, el in enumerate(canvas.objects):
+        if is_tile_name((el.get('name') or el.get('id') or '').lower()):
+            value_tiles.append((i, el))
     
     # Check value tile sizes
-    for tile in value_tiles:
+    for _, tile in value_tiles:
         tile_width = tile.get('width', 0) * tile.get('scaleX', 1)
         tile_height = tile.get('height', 0) * tile.get('scaleY', 1)
         
@@ -707,42 +1054,46 @@ def check_value_tile(objects: list, canvas_width: int = 1080, canvas_height: int
             })
     
     # Check for overlap with value tiles
-    for tile in value_tiles:
-        tile_box = get_bounding_box(tile)
-        
-        for el in objects:
-            if el == tile:
-                continue
-            el_box = get_bounding_box(el)
-            
-            if check_overlap(tile_box, el_box):
-                violations.append({
-                    "elementId": el.get('id'),
-                    "rule": "VALUE_TILE_OVERLAP",
-                    "severity": "hard",
-                    "message": "Element overlaps value tile - nothing may overlap the value tile",
-                    "autoFixable": True,
-                    "autoFix": {
-                        "action": "move_away",
-                        "from": tile.get('id'),
-                        # Move conflicting element to safe position
-                        "suggestedTop": int(canvas_height * 0.25)  # Below headline area
-                    }
-                })
+    if not value_tiles:
+        return violations
+    
+    objects = canvas.objects
+    boxes = canvas.bbox_array(range(len(objects)))
+    tile_indices = [tile_index for tile_index, _ in value_tiles]
+    # Every tile against every object in one broadcast, minus each tile itself
+    overlaps = overlap_table(boxes[tile_indices], boxes)
+    overlaps[np.arange(len(tile_indices)), tile_indices] = False
+    
+    for (_, tile), tile_overlaps in zip(value_tiles, overlaps):
+        for i in np.flatnonzero(tile_overlaps):
+            el = objects[i]
+            violations.append({
+                "elementId": el.get('id'),
+                "rule": "VALUE_TILE_OVERLAP",
+                "severity": "hard",
+                "message": "Element overlaps value tile - nothing may overlap the value tile",
+                "autoFixable": True,
+                "autoFix": {
+                    "action": "move_away",
+                    "from": tile.get('id'),
+                    # Move conflicting element to safe position
+                    "suggestedTop": int(canvas_height * 0.25)  # Below headline area
+                }
+            })
     
     return violations
 
 
-def check_clubcard_date(objects: list) -> list:
+def check_clubcard_date(canvas: CanvasObjects, out: Optional[list] = None) -> list:
     """
     Rule 12: CLUBCARD_DATE - DD/MM format required
     If Clubcard Price tile is used, tag must include 'Clubcard/app required. Ends DD/MM'
     """
-    violations = []
+    violations = [] if out is None else out
     
     # Check for Clubcard tile
     has_clubcard_tile = False
-    for el in objects:
+    for el in canvas.objects:
         name = (el.get('name') or el.get('id') or '').lower()
         src = (el.get('src') or '').lower()
         if 'clubcard' in name or 'clubcard' in src:
@@ -753,14 +1104,12 @@ def check_clubcard_date(objects: list) -> list:
         return violations
     
     # Must have proper date format in tags
-    text_elements = [o for o in objects if o.get('type') in ['text', 'textbox', 'i-text']]
     has_proper_tag = False
     
-    for el in text_elements:
-        text = (el.get('text') or '').lower()
+    for text in canvas.texts_lower:
         # Check for DD/MM pattern
         if 'clubcard' in text and 'ends' in text:
-            date_pattern = re.search(r'\d{1,2}/\d{1,2}', text)
+            date_pattern = _CLUBCARD_DATE_RE.search(text)
             if date_pattern:
                 has_proper_tag = True
                 break
@@ -778,35 +1127,23 @@ def check_clubcard_date(objects: list) -> list:
     return violations
 
 
-def check_drinkaware(objects: list, background: str) -> list:
+def check_drinkaware(canvas: CanvasObjects, background: str, out: Optional[list] = None) -> list:
     """
     Rule 13: DRINKAWARE - Alcohol campaigns requirement
     Mandatory for alcohol, must be black or white, min 20px (12px for SAYS)
     """
-    violations = []
+    violations = [] if out is None else out
     
     # Check if this is an alcohol campaign
-    text_elements = [o for o in objects if o.get('type') in ['text', 'textbox', 'i-text']]
-    alcohol_keywords = ['beer', 'wine', 'spirit', 'vodka', 'whisky', 'gin', 'rum', 'alcohol', 'lager', 'ale', 'cider']
-    
-    is_alcohol_campaign = False
-    for el in text_elements:
-        text = (el.get('text') or '').lower()
-        if any(kw in text for kw in alcohol_keywords):
-            is_alcohol_campaign = True
-            break
-    
-    if not is_alcohol_campaign:
+    if not canvas.has_alcohol:
         return violations
     
     # Check for Drinkaware logo/text
     has_drinkaware = False
     drinkaware_element = None
     
-    for el in objects:
-        src = (el.get('src') or '').lower()
-        text = (el.get('text') or '').lower()
-        if 'drinkaware' in src or 'drinkaware' in text:
+    for el in canvas.objects:
+        if _DRINKAWARE_RE.search(el.get('src') or '') or _DRINKAWARE_RE.search(el.get('text') or ''):
             has_drinkaware = True
             drinkaware_element = el
             break
@@ -849,25 +1186,23 @@ def check_drinkaware(objects: list, background: str) -> list:
     return violations
 
 
-def check_logo_presence(objects: list, canvas_width: int = 1080, canvas_height: int = 1920) -> list:
+def check_logo_presence(canvas: CanvasObjects, canvas_width: int = 1080, canvas_height: int = 1920, out: Optional[list] = None) -> list:
     """
     Rule 14: LOGO - Logo appears on all banners
     Can be uploaded or from brand library
     When missing: ADD TESCO LOGO at RIGHT SIDE (TOP-RIGHT corner)
     """
-    violations = []
-    image_elements = [o for o in objects if o.get('type') == 'image']
-    text_elements = [o for o in objects if o.get('type') in ['text', 'textbox', 'i-text']]
+    violations = [] if out is None else out
     
     # Check for logo in image src or name
-    has_logo_image = any('logo' in (el.get('src') or el.get('name') or '').lower() for el in image_elements)
+    has_logo_image = any('logo' in (el.get('src') or el.get('name') or '').lower() for el in canvas.images)
     
     # Check for custom property isLogo or customId containing "logo"
     has_custom_logo = any(
         el.get('isLogo') == True or 
         'brand-logo' in (el.get('customId') or '').lower() or
         ('logo' in (el.get('customId') or '').lower() and 'tesco' not in (el.get('customId') or '').lower())
-        for el in objects
+        for el in canvas.objects
     )
     
     # Don't count Tesco tags as brand logos
@@ -906,22 +1241,15 @@ def check_logo_presence(objects: list, canvas_width: int = 1080, canvas_height:
     return violations
 
 
-def check_text_alignment(objects: list) -> list:
+def check_text_alignment(canvas: CanvasObjects, out: Optional[list] = None) -> list:
     """
     Rule 15: TEXT_ALIGNMENT - LEP copy must be left-aligned
     """
-    violations = []
-    text_elements = [o for o in objects if o.get('type') in ['text', 'textbox', 'i-text']]
+    violations = [] if out is None else out
+    text_elements = canvas.texts
     
     # Check if this is LEP format
-    is_lep = False
-    for el in text_elements:
-        text = (el.get('text') or '').lower()
-        if 'low everyday price' in text or 'lep' in text:
-            is_lep = True
-            break
-    
-    if is_lep:
+    if canvas.is_lep:
         for el in text_elements:
             text_align = el.get('textAlign', 'left')
             if text_align != 'left':
@@ -937,20 +1265,17 @@ def check_text_alignment(objects: list) -> list:
     return violations
 
 
-def check_photography_people(objects: list) -> list:
+def check_photography_people(canvas: CanvasObjects, out: Optional[list] = None) -> list:
     """
     Rule 16: PEOPLE_PHOTO - Detect presence of people in images
     User must confirm people are integral to campaign (warning)
     """
-    violations = []
-    image_elements = [o for o in objects if o.get('type') == 'image']
+    violations = [] if out is None else out
     
     # Check for people-related keywords in image names/sources
-    people_keywords = ['person', 'people', 'human', 'face', 'model', 'portrait']
-    
-    for el in image_elements:
-        src = (el.get('src') or el.get('name') or '').lower()
-        if any(kw in src for kw in people_keywords):
+    is_people = _PEOPLE_RE.search
+    for el in canvas.images:
+        if is_people((el.get('src') or el.get('name') or '').lower()):
             violations.append({
                 "elementId": el.get('id'),
                 "rule": "PEOPLE_PHOTO",
@@ -964,85 +1289,84 @@ def check_photography_people(objects: list) -> list:
     return violations
 
 
-def check_tag_text_validity(objects: list) -> list:
+def check_tag_text_validity(canvas: CanvasObjects, out: Optional[list] = None) -> list:
     """
     Rule 17: TAG_TEXT - Only allowed Tesco tag texts permitted
     Skip text elements marked as brand logos
     """
-    violations = []
-    text_elements = [o for o in objects if o.get('type') in ['text', 'textbox', 'i-text']]
+    violations = [] if out is None else out
     
-    for el in text_elements:
-        # Skip if this is marked as a logo
-        if el.get('isLogo') == True or 'logo' in (el.get('customId') or '').lower():
-            continue
-            
-        text = (el.get('text') or '').lower().strip()
-        
-        # If it mentions Tesco, it must be an allowed tag format
-        if 'tesco' in text:
-            is_allowed = any(allowed in text for allowed in ALLOWED_TESCO_TAGS)
-            if not is_allowed:
-                violations.append({
-                    "elementId": el.get('id'),
-                    "rule": "TAG_TEXT",
-                    "severity": "hard",
-                    "message": "Tesco tag must use allowed format: 'Only at Tesco', 'Available at Tesco', or 'Selected stores. While stocks last.'",
-                    "autoFixable": True,
-                    "autoFix": {"property": "text", "value": "Available at Tesco"}
-                })
+    # Non-logo texts that mention Tesco must use an allowed tag format
+    for el in scan_text_elements(canvas).invalid_tesco_texts:
+        violations.append({
+            "elementId": el.get('id'),
+            "rule": "TAG_TEXT",
+            "severity": "hard",
+            "message": "Tesco tag must use allowed format: 'Only at Tesco', 'Available at Tesco', or 'Selected stores. While stocks last.'",
+            "autoFixable": True,
+            "autoFix": {"property": "text", "value": "Available at Tesco"}
+        })
     
     return violations
 
 
-def check_tag_overlap(objects: list) -> list:
+def check_tag_overlap(canvas: CanvasObjects, out: Optional[list] = None) -> list:
     """
     Rule 18: TAG_OVERLAP - Tesco tags must not be overlapped
     """
-    violations = []
+    violations = [] if out is None else out
     
     # Find Tesco tags
-    tesco_tags = []
-    for el in objects:
-        if el.get('type') in ['text', 'textbox', 'i-text']:
-            text = (el.get('text') or '').lower()
-            if any(tag in text for tag in ALLOWED_TESCO_TAGS):
-                tesco_tags.append(el)
-    
-    # Check for overlap
-    for tag in tesco_tags:
-        tag_box = get_bounding_box(tag)
+    tesco_tags = [
+        (index, el) for el, is_tag, index in zip(canvas.texts, canvas.text_is_tag, canvas.text_indices)
+        if is_tag
+    ]
+    if not tesco_tags:
+        return violations
+    
+    # Check for overlap - every tag against every object in one broadcast
+    objects = canvas.objects
+    if not canvas.broken:
+        tag_indices = [tag_index for tag_index, _ in tesco_tags]
+        overlaps = overlap_table(canvas.boxes[tag_indices], canvas.boxes)
+        overlaps[np.arange(len(tag_indices)), tag_indices] = False  # each tag itself
+        tag_overlapped = overlaps.any(axis=1)
+    
+    for n, (tag_index, tag) in enumerate(tesco_tags):
+        if not canvas.broken:
+            overlapped = tag_overlapped[n]
+        else:
+            tag_box = canvas.bbox(tag_index)
+            # Malformed element (e.g. null text): walk element by element so it
+            # only fails when reached before an overlap, as before
+            overlapped = any(
+                check_overlap(tag_box, canvas.bbox(i))
+                for i in range(len(objects)) if i != tag_index
+            )
         
-        for el in objects:
-            if el == tag:
-                continue
-            el_box = get_bounding_box(el)
-            
-            if check_overlap(tag_box, el_box):
-                violations.append({
-                    "elementId": tag.get('id'),
-                    "rule": "TAG_OVERLAP",
-                    "severity": "hard",
-                    "message": "Tesco tag must not be overlapped by other elements",
-                    "autoFixable": True,
-                    "autoFix": {"action": "bring_to_front"}
-                })
-                break
+        if overlapped:
+            violations.append({
+                "elementId": tag.get('id'),
+                "rule": "TAG_OVERLAP",
+                "severity": "hard",
+                "message": "Tesco tag must not be overlapped by other elements",
+                "autoFixable": True,
+                "autoFix": {"action": "bring_to_front"}
+            })
     
     return violations
 
 
-def check_background(objects: list, background: str) -> list:
+def check_background(canvas: CanvasObjects, background: str, out: Optional[list] = None) -> list:
     """
     Rule 19: BACKGROUND - Flat color or single image allowed
     """
-    violations = []
+    violations = [] if out is None else out
     
-    # Check background images (should be max 1)
-    bg_images = [o for o in objects if o.get('type') == 'image' and 
-                 (o.get('name') or '').lower() in ['background', 'bg']]
+    # Check background images (should be max 1) - stop at the second one
+    bg_images = (o for o in canvas.images if (o.get('name') or '').lower() in BACKGROUND_IMAGE_NAMES)
     
-    if len(bg_images) > 1:
+    if next(bg_images, None) is not None and next(bg_images, None) is not None:
         violations.append({
             "elementId": None,
             "rule": "BACKGROUND",
@@ -1055,27 +1379,19 @@ def check_background(objects: list, background: str) -> list:
     return violations
 
 
-def check_lep_rules(objects: list, background: str) -> list:
+def check_lep_rules(canvas: CanvasObjects, background: str, out: Optional[list] = None) -> list:
     """
     Rule 20: LEP_RULES - Low Everyday Price specific rules
     White background, Tesco blue font, white value tile, left-aligned
     """
-    violations = []
-    text_elements = [o for o in objects if o.get('type') in ['text', 'textbox', 'i-text']]
+    violations = [] if out is None else out
     
     # Check if LEP design
-    is_lep = False
-    for el in text_elements:
-        text = (el.get('text') or '').lower()
-        if 'low everyday price' in text or 'lep' in text:
-            is_lep = True
-            break
-    
-    if not is_lep:
+    if not canvas.is_lep:
         return violations
     
     # LEP requires white background
-    if background.lower() not in ['#ffffff', '#fff', 'white', 'rgb(255,255,255)']:
+    if background.lower() not in WHITE_BACKGROUNDS:
         violations.append({
             "elementId": None,
             "rule": "LEP_BACKGROUND",
@@ -1087,8 +1403,7 @@ def check_lep_rules(objects: list, background: str) -> list:
     
     # LEP requires mandatory tag
     has_lep_tag = False
-    for el in text_elements:
-        text = (el.get('text') or '').lower()
+    for text in canvas.texts_lower:
         if LEP_REQUIRED_TAG in text:
             has_lep_tag = True
             break
@@ -1108,6 +1423,21 @@ def check_lep_rules(objects: list, background: str) -> list:
 
 # ==================== HTML PREVIEW GENERATOR ====================
 
+# One-line element templates - no indentation whitespace in the payload
+_TEXT_ELEMENT_TPL = (
+    '<div style="position:absolute;left:{x}px;top:{y}px;transform:rotate({rotation}deg);'
+    'opacity:{opacity};font-size:{font_size}px;font-family:{font_family};color:{fill};'
+    'font-weight:{font_weight};text-align:{text_align};white-space:pre-wrap;'
+    'max-width:{max_width}px;{violation_style}">{text}</div>'
+)
+_IMAGE_ELEMENT_TPL = (
+    '<img src="{src}" style="position:absolute;left:{x}px;top:{y}px;width:{width}px;'
+    'height:{height}px;transform:rotate({rotation}deg);opacity:{opacity};object-fit:cover;'
+    '{violation_style}" />'
+)
+_VIOLATION_STYLE = 'outline:3px solid #ff4d4f;outline-offset:2px;'
+
+
 def generate_html_preview(canvas_data: dict, violations: list) -> str:
     """Generate HTML preview of canvas with violation highlights"""
     objects = canvas_data['objects']
@@ -1116,64 +1446,53 @@ def generate_html_preview(canvas_data: dict, violations: list) -> str:
     background = canvas_data['background']
     
     violation_ids = [v.get('elementId') for v in violations if v.get('elementId')]
+    try:
+        violation_ids = frozenset(violation_ids)
+    except TypeError:
+        pass  # unhashable ids from a malformed canvas - keep the list scan
     
     elements_html = []
     for obj in objects:
-        obj_id = obj.get('id', '')
-        has_violation = obj_id in violation_ids
+        g = obj.get
+        obj_id = g('id', '')
+        try:
+            has_violation = obj_id in violation_ids
+        except TypeError:
+            has_violation = False  # unhashable id, so not in the (hashable) set
         
-        x = obj.get('left', obj.get('x', 0))
-        y = obj.get('top', obj.get('y', 0))
-        rotation = obj.get('angle', 0)
-        opacity = obj.get('opacity', 1)
-        scale_x = obj.get('scaleX', 1)
-        scale_y = obj.get('scaleY', 1)
-        actual_width = obj.get('width', 100) * scale_x
-        actual_height = obj.get('height', 100) * scale_y
+        x = g('left', g('x', 0))
+        y = g('top', g('y', 0))
+        rotation = g('angle', 0)
+        opacity = g('opacity', 1)
+        actual_width = g('width', 100) * g('scaleX', 1)
+        actual_height = g('height', 100) * g('scaleY', 1)
         
-        violation_style = 'outline: 3px solid #ff4d4f; outline-offset: 2px;' if has_violation else ''
+        violation_style = _VIOLATION_STYLE if has_violation else ''
         
-        obj_type = obj.get('type', '').lower()
+        obj_type = g('type', '').lower()
         
-        if obj_type in ['text', 'textbox', 'i-text']:
-            font_size = obj.get('fontSize', 16)
-            font_family = obj.get('fontFamily', 'Arial')
-            fill = obj.get('fill', '#000000')
-            font_weight = 'bold' if obj.get('fontWeight') == 'bold' else 'normal'
-            text_align = obj.get('textAlign', 'left')
-            text = obj.get('text', '')
-            
-            elements_html.append(f'''<div style="
-                position: absolute;
-                left: {x}px;
-                top: {y}px;
-                transform: rotate({rotation}deg);
-                opacity: {opacity};
-                font-size: {font_size}px;
-                font-family: {font_family};
-                color: {fill};
-                font-weight: {font_weight};
-                text-align: {text_align};
-                white-space: pre-wrap;
-                max-width: {actual_width}px;
-                {violation_style}
-            ">{text}</div>''')
+        if obj_type in TEXT_TYPES:
+            elements_html.append(_TEXT_ELEMENT_TPL.format(
+                x=x, y=y, rotation=rotation, opacity=opacity,
+                font_size=g('fontSize', 16),
+                font_family=g('fontFamily', 'Arial'),
+                fill=g('fill', '#000000'),
+                font_weight='bold' if g('fontWeight') == 'bold' else 'normal',
+                text_align=g('textAlign', 'left'),
+                max_width=actual_width,
+                violation_style=violation_style,
+                text=html.escape(str(g('text', '')), quote=False),
+            ))
         
         elif obj_type == 'image':
-            src = obj.get('src', '')
-            elements_html.append(f'''<img src="{src}" style="
-                position: absolute;
-                left: {x}px;
-                top: {y}px;
-                width: {actual_width}px;
-                height: {actual_height}px;
-                transform: rotate({rotation}deg);
-                opacity: {opacity};
-                object-fit: cover;
-                {violation_style}
-            " />''')
-    
-    html = f'''<!DOCTYPE html>
+            elements_html.append(_IMAGE_ELEMENT_TPL.format(
+                src=html.escape(str(g('src', ''))),
+                x=x, y=y, width=actual_width, height=actual_height,
+                rotation=rotation, opacity=opacity,
+                violation_style=violation_style,
+            ))
+    
+    page = f'''<!DOCTYPE html>
 <html>
 <head>
     <meta charset="UTF-8">
@@ -1197,108 +1516,195 @@ def generate_html_preview(canvas_data: dict, violations: list) -> str:
 </body>
 </html>'''
     
-    return html
+    return page
 
 
 # ==================== MAIN VALIDATION ====================
 
-def validate_canvas_locally(canvas: str) -> ValidationResponse:
-    """Full local validation against ALL 20 Tesco compliance rules"""
+def validate_canvas_locally(canvas: str, fast_fail: bool = False) -> ValidationResponse:
+    """
+    Full local validation against ALL 20 Tesco compliance rules.
+    With fast_fail=True, stop after the first rule that reports a hard violation -
+    for callers that only need the compliant/non-compliant verdict.
+    """
     logger.info("🔍 [TESCO COMPLIANCE] Starting full validation (20 rules)...")
     
     canvas_data = parse_fabric_canvas(canvas)
     objects = canvas_data['objects']
     background = canvas_data['background']
+    background_luminance = canvas_data['background_luminance']
     width = canvas_data['width']
     height = canvas_data['height']
     
     logger.info(f"📊 Canvas: {width}x{height}px, {len(objects)} objects")
     
-    # Run ALL 20 validation rules
+    # Classify once; every rule reads the same text/image views
+    classified = classify_objects(objects)
+    
+    rule_groups = [
+        # Essential rules (1-3) - Pass canvas dimensions for HARDCODED positions
+        ("📝 Checking essential elements...", [
+            (check_tesco_tag, (classified, width, height)),           # Rule 1
+            (check_headline, (classified, width, height)),            # Rule 2
+            (check_subhead, (classified, width, height)),             # Rule 3
+        ]),
+        # Font & text rules (4, 15, 17)
+        ("🔤 Checking font & text rules...", [
+            (check_min_font_size, (classified,)),       # Rule 4
+            (check_text_alignment, (classified,)),      # Rule 15
+            (check_tag_text_validity, (classified,)),   # Rule 17
+        ]),
+        # Layout rules (5, 11, 18)
+        ("📐 Checking layout rules...", [
+            (check_safe_zones, (classified, width, height)),  # Rule 5
+            (check_value_tile, (classified, width, height)),  # Rule 11 - Pass canvas dims
+            (check_tag_overlap, (classified,)),         # Rule 18
+        ]),
+        # Visual rules (6, 19)
+        ("🎨 Checking visual rules...", [
+            (check_contrast, (classified, background, background_luminance)),  # Rule 6
+            (check_background, (classified, background)),  # Rule 19
+        ]),
+        # Content rules (7, 8)
+        ("📄 Checking content rules...", [
+            (check_blocked_keywords, (classified,)),    # Rule 7
+            (check_cta_not_allowed, (classified,)),     # Rule 8
+        ]),
+        # Image/Packshot rules (9, 10, 14, 16)
+        ("🖼️ Checking packshot rules...", [
+            (check_packshot, (classified,)),            # Rule 9
+            (check_packshot_safe_zone, (classified,)),  # Rule 10
+            (check_logo_presence, (classified, width, height)),       # Rule 14 - Pass canvas dims
+            (check_photography_people, (classified,)),  # Rule 16
+        ]),
+        # Special format rules (12, 13, 20)
+        ("⭐ Checking special format rules...", [
+            (check_clubcard_date, (classified,)),       # Rule 12
+            (check_drinkaware, (classified, background)),  # Rule 13
+            (check_lep_rules, (classified, background)),   # Rule 20
+        ]),
+    ]
+    
+    # Campaign-specific rules can't fire when their campaign probe is false
+    skipped = set()
+    if not classified.has_alcohol:
+        skipped.add(check_drinkaware)
+    if not classified.is_lep:
+        skipped.update((check_text_alignment, check_lep_rules))
+    
+    # Run ALL 20 validation rules - every rule appends to the one shared list
     all_violations = []
+    stopped = False
     
-    # Essential rules (1-3) - Pass canvas dimensions for HARDCODED positions
-    logger.info("📝 Checking essential elements...")
-    all_violations.extend(check_tesco_tag(objects, width, height))           # Rule 1
-    all_violations.extend(check_headline(objects, width, height))            # Rule 2
-    all_violations.extend(check_subhead(objects, width, height))             # Rule 3
-    
-    # Font & text rules (4, 15, 17)
-    logger.info("🔤 Checking font & text rules...")
-    all_violations.extend(check_min_font_size(objects))       # Rule 4
-    all_violations.extend(check_text_alignment(objects))      # Rule 15
-    all_violations.extend(check_tag_text_validity(objects))   # Rule 17
-    
-    # Layout rules (5, 11, 18)
-    logger.info("📐 Checking layout rules...")
-    all_violations.extend(check_safe_zones(objects, width, height))  # Rule 5
-    all_violations.extend(check_value_tile(objects, width, height))  # Rule 11 - Pass canvas dims
-    all_violations.extend(check_tag_overlap(objects))         # Rule 18
-    
-    # Visual rules (6, 19)
-    logger.info("🎨 Checking visual rules...")
-    all_violations.extend(check_contrast(objects, background)) # Rule 6
-    all_violations.extend(check_background(objects, background)) # Rule 19
-    
-    # Content rules (7, 8)
-    logger.info("📄 Checking content rules...")
-    all_violations.extend(check_blocked_keywords(objects))    # Rule 7
-    all_violations.extend(check_cta_not_allowed(objects))     # Rule 8
-    
-    # Image/Packshot rules (9, 10, 14, 16)
-    logger.info("🖼️ Checking packshot rules...")
-    all_violations.extend(check_packshot(objects))            # Rule 9
-    all_violations.extend(check_packshot_safe_zone(objects))  # Rule 10
-    all_violations.extend(check_logo_presence(objects, width, height))       # Rule 14 - Pass canvas dims
-    all_violations.extend(check_photography_people(objects))  # Rule 16
-    
-    # Special format rules (12, 13, 20)
-    logger.info("⭐ Checking special format rules...")
-    all_violations.extend(check_clubcard_date(objects))       # Rule 12
-    all_violations.extend(check_drinkaware(objects, background)) # Rule 13
-    all_violations.extend(check_lep_rules(objects, background))  # Rule 20
-    
-    # Calculate results
-    hard_fails = [v for v in all_violations if v['severity'] == 'hard']
-    warnings = [v for v in all_violations if v['severity'] == 'warning']
+    for group_message, checks in rule_groups:
+        logger.info(group_message)
+        for check, args in checks:
+            if check in skipped:
+                continue
+            start = len(all_violations)
+            check(*args, out=all_violations)
+            if fast_fail and any(all_violations[i]['severity'] == 'hard' for i in range(start, len(all_violations))):
+                logger.info(f"⏹️ Fast fail: hard violation from {check.__name__}, skipping remaining rules")
+                stopped = True
+                break
+        if stopped:
+            break
+    
+    # Calculate results - one pass for the counts, frontend issues and
+    # the top suggestions
+    hard_count = warning_count = 0
+    failed_rule_names = set()
+    issues = []
+    top_messages = []
+    for v in all_violations:
+        severity = v['severity']
+        if severity == 'hard':
+            hard_count += 1
+            failed_rule_names.add(v['rule'])
+        elif severity == 'warning':
+            warning_count += 1
+        
+        # Format issues for frontend
+        issues.append({
+            "rule": v["rule"],
+            "type": v["rule"],
+            "severity": "critical" if severity == "hard" else "warning",
+            "message": v["message"],
+            "elementId": v.get("elementId"),
+            "autoFixable": v.get("autoFixable", False),
+            "fix": v.get("autoFix")
+        })
+        if len(top_messages) < 5:  # Top 5 suggestions
+            top_messages.append(v["message"])
     
     total_rules = 20
-    failed_rules = len(set(v['rule'] for v in hard_fails))
-    score = max(0, 100 - (failed_rules * 5) - (len(warnings) * 2))
-    compliant = len(hard_fails) == 0
+    failed_rules = len(failed_rule_names)
+    score = max(0, 100 - (failed_rules * 5) - (warning_count * 2))
+    compliant = hard_count == 0
     
     logger.info(f"{'✅' if compliant else '❌'} Result: {'COMPLIANT' if compliant else 'NON-COMPLIANT'}")
-    logger.info(f"📈 Score: {score}/100 | Hard fails: {len(hard_fails)} | Warnings: {len(warnings)}")
+    logger.info(f"📈 Score: {score}/100 | Hard fails: {hard_count} | Warnings: {warning_count}")
     
     # Generate preview
     html_preview = generate_html_preview(canvas_data, all_violations)
     
-    # Format issues for frontend
-    issues = [{
-        "rule": v["rule"],
-        "type": v["rule"],
-        "severity": "critical" if v["severity"] == "hard" else "warning",
-        "message": v["message"],
-        "elementId": v.get("elementId"),
-        "autoFixable": v.get("autoFixable", False),
-        "fix": v.get("autoFix")
-    } for v in all_violations]
-    
-    suggestions = []
     if not compliant:
-        for v in all_violations[:5]:  # Top 5 suggestions
-            suggestions.append(v["message"])
+        suggestions = top_messages
     else:
-        suggestions.append("Canvas meets all Tesco compliance requirements ✅")
+        suggestions = ["Canvas meets all Tesco compliance requirements ✅"]
     
-    return ValidationResponse(
+    # Every field is built right here from known types - skip re-validating
+    # what can be hundreds of issue dicts
+    return ValidationResponse.model_construct(
         canvas=html_preview,
         compliant=compliant,
         issues=issues,
-        suggestions=list(set(suggestions))
+        suggestions=list(dict.fromkeys(suggestions))  # de-duplicated, in rule order
     )
 
 
-async def run_validation(canvas: str) -> ValidationResponse:
+_validation_cache: "OrderedDict[tuple, ValidationResponse]" = OrderedDict()
+_validation_cache_lock = threading.Lock()
+_validation_cache_chars = 0
+
+
+def canvas_digest(canvas: str) -> bytes:
+    """Cache key for a canvas JSON string"""
+    return hashlib.blake2b(canvas.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+
+
+def validate_canvas_cached(canvas: str, fast_fail: bool = False) -> ValidationResponse:
+    """
+    validate_canvas_locally, reusing the result for a canvas seen recently.
+    The cached response is shared between callers - treat it as read-only.
+    """
+    key = (canvas_digest(canvas), fast_fail)
+    with _validation_cache_lock:
+        result = _validation_cache.get(key)
+        if result is not None:
+            _validation_cache.move_to_end(key)
+            logger.info("♻️ [TESCO COMPLIANCE] Same canvas as a recent request, reusing its result")
+            return result
+    
+    result = validate_canvas_locally(canvas, fast_fail=fast_fail)
+    size = len(result.canvas)
+    if size > VALIDATION_CACHE_MAX_ENTRY_CHARS:
+        return result
+
+    global _validation_cache_chars
+    with _validation_cache_lock:
+        previous = _validation_cache.pop(key, None)
+        if previous is not None:
+            _validation_cache_chars -= len(previous.canvas)
+        _validation_cache[key] = result
+        _validation_cache_chars += size
+        while (len(_validation_cache) > VALIDATION_CACHE_MAX_ENTRIES
+               or _validation_cache_chars > VALIDATION_CACHE_MAX_CHARS):
+            _, evicted = _validation_cache.popitem(last=False)
+            _validation_cache_chars -= len(evicted.canvas)
+    return result
+
+
+async def run_validation(canvas: str, fast_fail: bool = False) -> ValidationResponse:
     """Run validation with full Tesco compliance checks"""
-    return validate_canvas_locally(canvas)
+    return validate_canvas_cached(canvas, fast_fail=fast_fail)
@@ -1,13 +1,17 @@
 import uuid
 import io
 import os
+import random
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from dotenv import load_dotenv
-from google import genai
 from google.genai import types
 from PIL import Image
 
+from .genai_clients import get_api_key_client, get_vertex_client
+
 # Load .env from the Agents directory (parent of app/core)
 env_path = Path(__file__).resolve().parent.parent.parent / ".env"
 load_dotenv(dotenv_path=env_path)
@@ -44,6 +48,158 @@ Brand Safety:
 """
 
 
+# The model re-encodes whatever it receives, so send it a JPEG - a fraction of
+# the PNG's size and much cheaper to encode
+PRODUCT_MIME_TYPE = "image/jpeg"
+PRODUCT_JPEG_QUALITY = 88
+
+# Gemini calls for the three styles of a request run side by side, but their
+# starts are spread out (plus jitter) so they don't all hit the quota at once
+VARIATION_WORKERS = 3
+VARIATION_STAGGER_SECONDS = 2.0
+VARIATION_JITTER_SECONDS = 1.0
+
+
+def _wait(seconds: float, cancelled: threading.Event | None) -> bool:
+    """Sleep for seconds, waking early if cancelled is set; True when cancelled"""
+    if cancelled is None:
+        time.sleep(seconds)
+        return False
+    return cancelled.wait(seconds)
+
+
+def _staggered(index: int, fn, *args, cancelled: threading.Event | None = None):
+    """
+    Wait for this style's slot in the stagger, then run fn(*args).
+    Returns None without calling fn if cancelled is set in the meantime.
+    """
+    if index:
+        delay = index * VARIATION_STAGGER_SECONDS + random.uniform(0, VARIATION_JITTER_SECONDS)
+        if _wait(delay, cancelled):
+            return None
+    return fn(*args)
+
+
+def _prepare_product_bytes(img: Image.Image) -> bytes:
+    """Downscale the product image to fit 1024x1024 and encode it as RGB JPEG"""
+    # Let JPEG decode at a reduced DCT scale before anything loads the full image
+    img.draft('RGB', (1024, 1024))
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    
+    # Bilinear is plenty for a downscale the model only uses as reference
+    img.thumbnail((1024, 1024), Image.Resampling.BILINEAR)
+    
+    img_byte_arr = io.BytesIO()
+    img.save(img_byte_arr, format='JPEG', quality=PRODUCT_JPEG_QUALITY)
+    return img_byte_arr.getvalue()
+
+
+def prepare_variation_input(image_bytes: bytes) -> bytes:
+    """Decode an uploaded product image into the JPEG sent with every style"""
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        return _prepare_product_bytes(img)
+
+
+def _with_rate_limit_retries(attempt, label: str, cancelled: threading.Event | None = None):
+    """
+    Run attempt(), retrying with jittered exponential backoff when rate limited.
+    Gives up with None once cancelled is set, before the next attempt.
+    """
+    max_retries = 3
+    base_delay = 10
+    
+    for retry in range(max_retries):
+        if cancelled is not None and cancelled.is_set():
+            print(f"Cancelled {label} before calling Gemini")
+            return None
+        try:
+            return attempt()
+            
+        except Exception as e:
+            error_msg = str(e)
+            is_rate_limit = "429" in error_msg or "RESOURCE_EXHAUSTED" in error_msg or "quota" in error_msg.lower()
+            
+            print(f"Error generating {label}: {e}")
+            
+            if is_rate_limit and retry < max_retries - 1:
+                _wait(base_delay * (2 ** retry) + random.uniform(0, VARIATION_JITTER_SECONDS), cancelled)
+                continue
+            return None
+    
+    return None
+
+
+def _variation_prompt(style_prompt: str) -> str:
+    """Wrap a style description in the keep-the-product instructions"""
+    return f"""
+    Keep the product in the input image EXACTLY unchanged.
+    Generate a new background: {style_prompt}
+    High realism, commercial photography.
+    """
+
+
+def _request_variation(client, style_prompt: str, product_bytes: bytes):
+    """One Gemini image request for a single style"""
+    return client.models.generate_content(
+        model=MODEL_ID,
+        contents=[
+            types.Part.from_text(text=_variation_prompt(style_prompt)),
+            types.Part.from_bytes(
+                mime_type=PRODUCT_MIME_TYPE,
+                data=product_bytes,
+            ),
+        ],
+        config=types.GenerateContentConfig(
+            response_modalities=["IMAGE"],
+            image_config=types.ImageConfig(aspect_ratio="1:1"),
+        ),
+    )
+
+
+def _generate_variation_file(client, style_prompt: str, product_bytes: bytes, static_folder: Path) -> str | None:
+    """Generate one style and save it under static/output, returning its relative path"""
+    try:
+        response = _request_variation(client, style_prompt, product_bytes)
+
+        if response.candidates:
+            candidate = response.candidates[0]
+            if candidate.content and candidate.content.parts:
+                for part in candidate.content.parts:
+                    if part.inline_data:
+                        output_filename = f"var_{uuid.uuid4()}.png"
+                        output_dir = static_folder / "output"
+                        output_dir.mkdir(parents=True, exist_ok=True)
+                        
+                        out_path = output_dir / output_filename
+                        part.as_image().save(out_path)
+                        
+                        return f"static/output/{output_filename}"
+        
+    except Exception as e:
+        print(f"Error generating variation: {e}")
+
+    return None
+
+
+def _generate_variation_base64(client, style_prompt: str, product_bytes: bytes, variation_num: int) -> str | None:
+    """Generate one style as base64, retrying with exponential backoff when rate limited"""
+    import base64
+    
+    def attempt():
+        response = _request_variation(client, style_prompt, product_bytes)
+        
+        if response.candidates and response.candidates[0].content and response.candidates[0].content.parts:
+            for part in response.candidates[0].content.parts:
+                if part.inline_data:
+                    return base64.b64encode(part.inline_data.data).decode('utf-8')
+        
+        # Success without an image - don't retry
+        return None
+    
+    return _with_rate_limit_retries(attempt, f"variation {variation_num}")
+
+
 def generate_variations(product_filename: str, user_concept: str) -> list[str]:
     base_dir = Path(__file__).resolve().parent.parent
     static_folder = base_dir / "static"
@@ -54,20 +210,9 @@ def generate_variations(product_filename: str, user_concept: str) -> list[str]:
         raise FileNotFoundError(f"File not found: {input_path}")
 
     with Image.open(input_path) as img:
-        if img.mode != 'RGB':
-            img = img.convert('RGB')
-        
-        img.thumbnail((1024, 1024))
-        
-        img_byte_arr = io.BytesIO()
-        img.save(img_byte_arr, format='PNG')
-        product_bytes = img_byte_arr.getvalue()
-
-    client = genai.Client(
-        vertexai=True,
-        project=PROJECT_ID,
-        location=LOCATION,
-    )
+        product_bytes = _prepare_product_bytes(img)
+
+    client = get_vertex_client(PROJECT_ID, LOCATION)
 
     styles = [
         # STUDIO - Clean e-commerce style
@@ -106,49 +251,13 @@ natural material properties (metal reflects, matte absorbs), subtle lens flare i
 {TESCO_COMPLIANCE_SUFFIX}"""
     ]
 
-    generated_files = []
-
-    for i, style_prompt in enumerate(styles):
-        try:
-            full_prompt = f"""
-            Keep the product in the input image EXACTLY unchanged.
-            Generate a new background: {style_prompt}
-            High realism, commercial photography.
-            """
-
-            response = client.models.generate_content(
-                model=MODEL_ID,
-                contents=[
-                    types.Part.from_text(text=full_prompt),
-                    types.Part.from_bytes(
-                        mime_type="image/png",
-                        data=product_bytes,
-                    ),
-                ],
-                config=types.GenerateContentConfig(
-                    response_modalities=["IMAGE"],
-                    image_config=types.ImageConfig(aspect_ratio="1:1"),
-                ),
-            )
-
-            if response.candidates:
-                candidate = response.candidates[0]
-                if candidate.content and candidate.content.parts:
-                    for part in candidate.content.parts:
-                        if part.inline_data:
-                            output_filename = f"var_{uuid.uuid4()}.png"
-                            output_dir = static_folder / "output"
-                            output_dir.mkdir(parents=True, exist_ok=True)
-                            
-                            out_path = output_dir / output_filename
-                            part.as_image().save(out_path)
-                            
-                            generated_files.append(f"static/output/{output_filename}")
-                            break
-            
-        except Exception as e:
-            print(f"Error generating variation: {e}")
-            continue
+    # The three styles are independent requests - run them side by side
+    with ThreadPoolExecutor(max_workers=VARIATION_WORKERS, thread_name_prefix="variations") as pool:
+        futures = [
+            pool.submit(_staggered, i, _generate_variation_file, client, style_prompt, product_bytes, static_folder)
+            for i, style_prompt in enumerate(styles)
+        ]
+        generated_files = [path for path in (f.result() for f in futures) if path]
 
     return generated_files
 
@@ -158,28 +267,14 @@ def generate_variations_from_bytes(image_bytes: bytes, user_concept: str) -> lis
     Generate background variations from raw image bytes.
     Returns list of base64 encoded PNG images.
     """
-    import base64
-    
     # Process input image
-    with Image.open(io.BytesIO(image_bytes)) as img:
-        if img.mode != 'RGB':
-            img = img.convert('RGB')
-        
-        img.thumbnail((1024, 1024))
-        
-        img_byte_arr = io.BytesIO()
-        img.save(img_byte_arr, format='PNG')
-        product_bytes = img_byte_arr.getvalue()
+    product_bytes = prepare_variation_input(image_bytes)
 
     if not PROJECT_ID or not LOCATION or not MODEL_ID:
         raise ValueError("Missing required environment variables: GCP_PROJECT_ID, GCP_LOCATION, or GEMINI_MODEL_ID")
     
     try:
-        client = genai.Client(
-            vertexai=True,
-            project=PROJECT_ID,
-            location=LOCATION,
-        )
+        client = get_vertex_client(PROJECT_ID, LOCATION)
     except Exception as e:
         print(f"Failed to initialize Gemini client: {e}")
         raise
@@ -221,71 +316,26 @@ natural material properties (metal reflects, matte absorbs), subtle lens flare i
 {TESCO_COMPLIANCE_SUFFIX}"""
     ]
 
-    generated_base64 = []
-
-    for i, style_prompt in enumerate(styles):
-        variation_num = i + 1
-        
-        # Add delay between requests to avoid rate limiting (except for first request)
-        if i > 0:
-            time.sleep(5)
-        
-        # Retry logic with exponential backoff for rate limiting
-        max_retries = 3
-        base_delay = 10
-        
-        for retry in range(max_retries):
-            try:
-                full_prompt = f"""
-                Keep the product in the input image EXACTLY unchanged.
-                Generate a new background: {style_prompt}
-                High realism, commercial photography.
-                """
-
-                response = client.models.generate_content(
-                    model=MODEL_ID,
-                    contents=[
-                        types.Part.from_text(text=full_prompt),
-                        types.Part.from_bytes(
-                            mime_type="image/png",
-                            data=product_bytes,
-                        ),
-                    ],
-                    config=types.GenerateContentConfig(
-                        response_modalities=["IMAGE"],
-                        image_config=types.ImageConfig(aspect_ratio="1:1"),
-                    ),
-                )
-                
-                if response.candidates and response.candidates[0].content and response.candidates[0].content.parts:
-                    parts = response.candidates[0].content.parts
-                    for part in parts:
-                        if part.inline_data:
-                            img_data = part.inline_data.data
-                            base64_str = base64.b64encode(img_data).decode('utf-8')
-                            generated_base64.append(base64_str)
-                            break
-                
-                # Success - break out of retry loop
-                break
-                
-            except Exception as e:
-                error_msg = str(e)
-                is_rate_limit = "429" in error_msg or "RESOURCE_EXHAUSTED" in error_msg or "quota" in error_msg.lower()
-                
-                print(f"Error generating variation {variation_num}: {e}")
-                
-                if is_rate_limit and retry < max_retries - 1:
-                    wait_time = base_delay * (2 ** retry)
-                    time.sleep(wait_time)
-                    continue
-                else:
-                    break
+    # The three styles are independent requests - run them side by side,
+    # each with its own rate-limit retries
+    with ThreadPoolExecutor(max_workers=VARIATION_WORKERS, thread_name_prefix="variations") as pool:
+        futures = [
+            pool.submit(_staggered, i, _generate_variation_base64, client, style_prompt, product_bytes, i + 1)
+            for i, style_prompt in enumerate(styles)
+        ]
+        generated_base64 = [image for image in (f.result() for f in futures) if image]
     
     return generated_base64
 
 
-def generate_single_variation(image_bytes: bytes, user_concept: str, style: str = "studio") -> str | None:
+def generate_single_variation(
+    image_bytes: bytes,
+    user_concept: str,
+    style: str = "studio",
+    product_bytes: bytes | None = None,
+    stagger_index: int = 0,
+    cancelled: threading.Event | None = None,
+) -> str | None:
     """
     Generate a single background variation for SSE streaming.
     Returns base64 encoded image immediately.
@@ -294,6 +344,12 @@ def generate_single_variation(image_bytes: bytes, user_concept: str, style: str
         image_bytes: Raw image bytes
         user_concept: User's concept/description
         style: One of 'studio', 'lifestyle', 'creative'
+        product_bytes: Output of prepare_variation_input, to share one encode
+            across the styles of a request
+        stagger_index: Position among the styles fired together; later ones
+            wait their turn before the first Gemini call
+        cancelled: Set when the result is no longer wanted (e.g. the client
+            disconnected); checked before every Gemini attempt
     
     Returns:
         Base64 encoded PNG image string, or None on failure
@@ -301,20 +357,15 @@ def generate_single_variation(image_bytes: bytes, user_concept: str, style: str
     import base64
     
     # Process input image
-    with Image.open(io.BytesIO(image_bytes)) as img:
-        if img.mode != 'RGB':
-            img = img.convert('RGB')
-        img.thumbnail((1024, 1024))
-        img_byte_arr = io.BytesIO()
-        img.save(img_byte_arr, format='PNG')
-        product_bytes = img_byte_arr.getvalue()
+    if product_bytes is None:
+        product_bytes = prepare_variation_input(image_bytes)
     
     # Initialize client with API key (not Vertex AI)
     api_key = os.getenv("GOOGLE_API_KEY")
     if not api_key:
         return None
     
-    client = genai.Client(api_key=api_key)
+    client = get_api_key_client(api_key)
     
     # Style prompts
     style_prompts = {
@@ -353,20 +404,20 @@ natural material properties (metal reflects, matte absorbs), subtle lens flare i
     
     style_prompt = style_prompts.get(style, style_prompts["studio"])
     
-    try:
-        full_prompt = f"""
+    full_prompt = f"""
         Keep the product in the input image EXACTLY unchanged.
         Generate a new background: {style_prompt}
         High realism, commercial photography.
         Output a square 1:1 aspect ratio image.
         """
-        
+    
+    def attempt():
         response = client.models.generate_content(
             model=MODEL_ID,
             contents=[
                 types.Part.from_text(text=full_prompt),
                 types.Part.from_bytes(
-                    mime_type="image/png",
+                    mime_type=PRODUCT_MIME_TYPE,
                     data=product_bytes,
                 ),
             ],
@@ -392,8 +443,10 @@ natural material properties (metal reflects, matte absorbs), subtle lens flare i
                     base64_image = base64.b64encode(image_data).decode('utf-8')
                     return base64_image
         
+        # Success without an image - don't retry
         return None
-        
-    except Exception as e:
-        print(f"Error generating {style}: {e}")
-        return None
\ No newline at end of file
+    
+    # Same spacing and rate-limit backoff as generate_variations_from_bytes
+    return _staggered(
+        stagger_index, _with_rate_limit_retries, attempt, style, cancelled, cancelled=cancelled
+    )
@@ -0,0 +1,224 @@
+"""
+Background removal with a shared rembg session and a small result cache
+"""
+
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+REMBG_MODEL = "u2net"
+CUTOUT_CACHE_MAX_ENTRIES = 16
+
+# The settings below are read when the session is built rather than at import,
+# so values from .env are seen once load_dotenv() has run
+
+
+def _ort_cache_dir() -> Path:
+    """
+    Graph-optimized ONNX models are written here on first load so later
+    processes can skip ONNX Runtime's graph optimization pass
+    """
+    return Path(
+        os.getenv("REMBG_ORT_CACHE_DIR", Path.home() / ".cache" / "retexture" / "onnx")
+    )
+
+
+def _configured_model_path() -> Optional[str]:
+    """
+    Optional pre-quantized (e.g. INT8) u2net-family model to load instead of
+    the default FP32 weights; see README "Background removal model"
+    """
+    return os.getenv("REMBG_MODEL_PATH")
+
+
+def _intra_op_threads() -> int:
+    """Half the cores by default so concurrent requests don't oversubscribe the CPU"""
+    return int(os.getenv("REMBG_INTRA_OP_THREADS", max(1, (os.cpu_count() or 2) // 2)))
+
+
+# Models sharing u2net's input/output layout can be reloaded through
+# rembg's "u2net_custom" session from an optimized file
+_U2NET_FAMILY = {"u2net", "u2netp"}
+
+_cutout_cache: "OrderedDict[str, bytes]" = OrderedDict()
+_cutout_cache_lock = threading.Lock()
+
+# One session per model name; the lock makes concurrent first requests wait
+# for a single model load instead of each building their own
+_sessions: dict = {}
+_session_lock = threading.Lock()
+
+
+def _find_session_class(model_name: str):
+    """Look up the rembg session class registered under this model name"""
+    from rembg.sessions import sessions_class
+
+    for session_class in sessions_class:
+        if session_class.name() == model_name:
+            return session_class
+    return None
+
+
+def _model_source_path(model_name: str) -> Path:
+    """The .onnx file the session is built from (downloaded on first use)"""
+    model_path = _configured_model_path()
+    if model_path:
+        return Path(model_path).expanduser()
+    session_class = _find_session_class(model_name)
+    path = Path(session_class.u2net_home()) / f"{model_name}.onnx"
+    if not path.exists():
+        path = Path(session_class.download_models())
+    return path
+
+
+def _optimized_cache_path(source: Path) -> Path:
+    """
+    Where the optimized copy of this model lives. The name carries the source
+    file's size and mtime and the ORT version, so replacing the model or
+    upgrading onnxruntime never picks up a stale graph.
+    """
+    import onnxruntime as ort
+
+    stat = source.stat()
+    return _ort_cache_dir() / (
+        f"{source.stem}.{stat.st_size}-{stat.st_mtime_ns}.ort{ort.__version__}.opt.onnx"
+    )
+
+
+def _remove_stale_optimized(source: Path, keep: Path):
+    """Delete optimized copies of this model built from an older source or ORT"""
+    own_name = re.compile(rf"{re.escape(source.stem)}\.\d+-\d+\.ort.+\.opt\.onnx")
+    for old in keep.parent.glob(f"{source.stem}.*.opt.onnx"):
+        if old != keep and own_name.fullmatch(old.name):
+            old.unlink(missing_ok=True)
+
+
+def _load_optimized_session(model_name: str):
+    """
+    Build the rembg session with a persistent ONNX Runtime optimization cache.
+    The first launch saves the optimized graph; later launches load it directly.
+    """
+    import onnxruntime as ort
+
+    source = _model_source_path(model_name)
+    optimized_path = _optimized_cache_path(source)
+    custom_class = _find_session_class("u2net_custom")
+    intra_op_threads = _intra_op_threads()
+
+    def session_options():
+        sess_opts = ort.SessionOptions()
+        sess_opts.intra_op_num_threads = intra_op_threads
+        return sess_opts
+
+    if optimized_path.exists():
+        sess_opts = session_options()
+        sess_opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+        try:
+            return custom_class("u2net_custom", sess_opts, model_path=str(optimized_path))
+        except Exception as e:
+            # Corrupt or half-written cache file - throw it away and rebuild
+            print(f"[REMBG] ⚠️ Discarding unreadable optimized model {optimized_path.name}: {e}")
+            optimized_path.unlink(missing_ok=True)
+
+    optimized_path.parent.mkdir(parents=True, exist_ok=True)
+    _remove_stale_optimized(source, optimized_path)
+
+    # ORT writes the optimized graph while building the session; write it
+    # under a name unique to this process and thread so an interrupted launch
+    # never leaves a truncated file at the real path, and two builders never
+    # share (or promote, or delete) each other's half-written file.
+    # get_rembg_session's lock keeps it to one build per process anyway.
+    tmp_path = optimized_path.with_name(
+        f"{optimized_path.name}.{os.getpid()}-{threading.get_ident()}.tmp"
+    )
+    sess_opts = session_options()
+    sess_opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    sess_opts.optimized_model_filepath = str(tmp_path)
+    try:
+        if _configured_model_path():
+            session = custom_class("u2net_custom", sess_opts, model_path=str(source))
+        else:
+            session = _find_session_class(model_name)(model_name, sess_opts)
+        if tmp_path.exists():
+            os.replace(tmp_path, optimized_path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    return session
+
+
+def _create_rembg_session(model_name: str):
+    """Build a rembg session, through the optimized-model cache where possible"""
+    from rembg import new_session
+
+    print(f"[REMBG] Loading '{model_name}' session (first use only)...")
+    if model_name in _U2NET_FAMILY:
+        try:
+            return _load_optimized_session(model_name)
+        except Exception as e:
+            print(f"[REMBG] ⚠️ Optimized model cache unavailable, using default session: {e}")
+        model_path = _configured_model_path()
+        if model_path:
+            # Keep the configured (e.g. INT8) model, just without the cache
+            return new_session("u2net_custom", model_path=model_path)
+    return new_session(model_name)
+
+
+def get_rembg_session(model_name: str = REMBG_MODEL):
+    """
+    Load the rembg model once per process.
+    rembg is imported lazily - loading onnxruntime at startup hangs the app.
+    """
+    session = _sessions.get(model_name)
+    if session is None:
+        with _session_lock:
+            session = _sessions.get(model_name)
+            if session is None:
+                session = _create_rembg_session(model_name)
+                _sessions[model_name] = session
+    return session
+
+
+def image_digest(data: bytes) -> str:
+    """Cache key for an uploaded image"""
+    return hashlib.sha1(data).hexdigest()
+
+
+def get_cached_cutout(key: str) -> Optional[bytes]:
+    """Return the cached PNG cut-out for this key, if any"""
+    with _cutout_cache_lock:
+        data = _cutout_cache.get(key)
+        if data is not None:
+            _cutout_cache.move_to_end(key)
+        return data
+
+
+def cache_cutout(key: str, data: bytes):
+    """Remember a PNG cut-out, evicting the least recently used one"""
+    with _cutout_cache_lock:
+        _cutout_cache[key] = data
+        _cutout_cache.move_to_end(key)
+        while len(_cutout_cache) > CUTOUT_CACHE_MAX_ENTRIES:
+            _cutout_cache.popitem(last=False)
+
+
+def run_rembg(data):
+    """Run rembg on bytes or a PIL image using the shared session"""
+    from rembg import remove
+
+    return remove(data, session=get_rembg_session())
+
+
+def remove_background_bytes(input_data: bytes) -> bytes:
+    """Remove the background from encoded image bytes, returning PNG bytes"""
+    key = image_digest(input_data)
+    cached = get_cached_cutout(key)
+    if cached is not None:
+        return cached
+
+    output_data = run_rembg(input_data)
+    cache_cutout(key, output_data)
+    return output_data
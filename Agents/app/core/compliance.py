@@ -6,8 +6,14 @@ def add_compliance_overlay(image_path: str, overlay_path: str, position: str = "
     Adds a compliance overlay (logo) to the image at image_path.
     Returns the path to the new image with overlay.
     """
-    base = Image.open(image_path).convert("RGBA")
-    overlay = Image.open(overlay_path).convert("RGBA")
+    # The output is saved as RGB, so composite straight onto an RGB base -
+    # the overlay's own alpha is the paste mask, the base alpha is never used
+    base = Image.open(image_path)
+    if base.mode != "RGB":
+        base = base.convert("RGBA").convert("RGB")
+    overlay = Image.open(overlay_path)
+    if overlay.mode != "RGBA":
+        overlay = overlay.convert("RGBA")
 
     # Resize overlay
     overlay_width = int(base.width * size_percent)
@@ -36,6 +42,10 @@ def add_compliance_overlay(image_path: str, overlay_path: str, position: str = "
 
     # Save new image
     out_path = str(Path(image_path).with_name(f"compliant_{Path(image_path).name}"))
-    base = base.convert("RGB")
-    base.save(out_path)
+    # Same pixels, fewer bytes: optimised Huffman tables (and progressive
+    # scans for JPEG) at the encoder's default quality
+    if Path(out_path).suffix.lower() in (".jpg", ".jpeg"):
+        base.save(out_path, optimize=True, progressive=True)
+    else:
+        base.save(out_path, optimize=True)
     return out_path
@@ -2,19 +2,20 @@
 Main compliant generation flow - integrates all components
 """
 
-from google import genai
 from google.genai import types
 from PIL import Image
 import io
 import base64
 import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+from .genai_clients import get_vertex_client
 from .models import GenerationRequest, GenerationResponse, ComplianceReport
 from .validators import validate_with_gemini_guardrail
 from .text_overlay import (
     calculate_optimal_text_color,
-    add_text_overlay,
+    draw_text_overlay,
     get_style_prompt,
 )
 from .value_tiles import add_value_tile
@@ -26,37 +27,30 @@ PROJECT_ID = os.getenv("GCP_PROJECT_ID")
 LOCATION = os.getenv("GCP_LOCATION")
 MODEL_ID = os.getenv("GEMINI_MODEL_ID")
 
+# Gemini's image model works at ~1024px; bigger product shots only add upload
+# time and encode cost
+MODEL_MAX_EDGE = 1024
 
-def generate_compliant_banner(request: GenerationRequest) -> GenerationResponse:
-    """
-    Main generation flow: Validate → Generate → Text → Tiles → Logos → Return
-    """
-    rules_enforced = []
-
-    # Step 1: Pre-validate with AI guardrail
-    validate_with_gemini_guardrail(request)
 
-    # Step 2: Prepare product image
-    if request.product_filename.startswith("data:image"):
-        # Base64 data URL
-        header, encoded = request.product_filename.split(",", 1)
-        image_data = base64.b64decode(encoded)
-    else:
-        # File path
-        with open(request.product_filename, "rb") as f:
-            image_data = f.read()
+def _downscale_for_model(image_data: bytes, max_edge: int = MODEL_MAX_EDGE) -> bytes:
+    """Shrink the product image to the model's working size, keeping its mode."""
+    try:
+        with Image.open(io.BytesIO(image_data)) as img:
+            if max(img.size) <= max_edge:
+                return image_data
+            img.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+            output = io.BytesIO()
+            img.save(output, format="PNG")
+            return output.getvalue()
+    except Exception as e:
+        print(f"[COMPLIANT-GEN] Could not downscale product image: {e}")
+        return image_data
 
-    # Step 3: Generate background with Gemini
-    style_prompt = get_style_prompt(request.style, request.concept)
-    full_prompt = f"""
-Keep the product EXACTLY unchanged. Only replace the background.
-{style_prompt}
-Leave top 100px and bottom 150px relatively clear for text and logos.
-High quality commercial photography, professional lighting, premium feel.
-"""
 
+def _generate_background(image_data: bytes, full_prompt: str) -> bytes:
+    """Replace the product background with Gemini and return the image bytes."""
     try:
-        client = genai.Client(vertexai=True, project=PROJECT_ID, location=LOCATION)
+        client = get_vertex_client(PROJECT_ID, LOCATION)
 
         response = client.models.generate_content(
             model=MODEL_ID,
@@ -84,6 +78,46 @@ High quality commercial photography, professional lighting, premium feel.
     except Exception as e:
         raise Exception(f"Image generation failed: {str(e)}")
 
+    return generated_bytes
+
+
+def _load_product_image(product_filename: str) -> bytes:
+    """Read the product image (data URL or file path) at the model's working size."""
+    if product_filename.startswith("data:image"):
+        # Base64 data URL
+        header, encoded = product_filename.split(",", 1)
+        image_data = base64.b64decode(encoded)
+    else:
+        # File path
+        with open(product_filename, "rb") as f:
+            image_data = f.read()
+    return _downscale_for_model(image_data)
+
+
+def generate_compliant_banner(request: GenerationRequest) -> GenerationResponse:
+    """
+    Main generation flow: Validate → Generate → Text → Tiles → Logos → Return
+    """
+    rules_enforced = []
+
+    # Step 1 + 2: Pre-validate with AI guardrail while the product image is
+    # decoded and downscaled. Only the cheap local prep overlaps the guardrail -
+    # the paid image generation waits for its verdict.
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="compliant-prep") as prep:
+        product_image = prep.submit(_load_product_image, request.product_filename)
+        validate_with_gemini_guardrail(request)  # raises on a hard block
+        image_data = product_image.result()
+
+    # Step 3: Generate background with Gemini
+    style_prompt = get_style_prompt(request.style, request.concept)
+    full_prompt = f"""
+Keep the product EXACTLY unchanged. Only replace the background.
+{style_prompt}
+Leave top 100px and bottom 150px relatively clear for text and logos.
+High quality commercial photography, professional lighting, premium feel.
+"""
+    generated_bytes = _generate_background(image_data, full_prompt)
+
     # Step 4: Smart contrast calculation
     text_color = request.text_color
     if not text_color:
@@ -91,10 +125,10 @@ High quality commercial photography, professional lighting, premium feel.
         rules_enforced.append(f"Auto-selected {text_color} text for optimal contrast")
 
     # Step 5: Add text overlay
-    image_with_text = add_text_overlay(generated_bytes, request, text_color)
+    # Later steps work on the PIL image, so skip a PNG encode/decode in between
+    img = draw_text_overlay(Image.open(io.BytesIO(generated_bytes)), request, text_color)
 
     # Step 6: Add value tile if requested
-    img = Image.open(io.BytesIO(image_with_text))
     if request.value_tile:
         img = add_value_tile(
             img,
@@ -112,10 +146,15 @@ High quality commercial photography, professional lighting, premium feel.
         rules_enforced.append("Added drinkaware logo (alcohol product)")
 
     # Step 8: Convert to base64 data URL
+    # The banner is a flattened photo with no alpha, so JPEG is far smaller
+    # and faster to encode than PNG.
+    if img.mode != "RGB":
+        img = img.convert("RGB")
     output = io.BytesIO()
-    img.save(output, format="PNG", quality=95)
-    base64_str = base64.b64encode(output.getvalue()).decode()
-    data_url = f"data:image/png;base64,{base64_str}"
+    img.save(output, format="JPEG", quality=85, optimize=True, progressive=True)
+    # Encode straight from the buffer's memoryview instead of copying it out first
+    base64_str = base64.b64encode(output.getbuffer()).decode()
+    data_url = f"data:image/jpeg;base64,{base64_str}"
 
     # Step 9: Build compliance report
     report = ComplianceReport(
@@ -0,0 +1,53 @@
+"""
+Shared Gemini clients - created once per process and reused across requests
+"""
+
+import importlib.util
+from functools import lru_cache
+from typing import Optional
+
+import httpx
+from google import genai
+from google.genai import types
+
+# Keep idle connections to the Gemini endpoint open between calls so each
+# request doesn't pay for a fresh TCP + TLS handshake.
+KEEPALIVE_LIMITS = httpx.Limits(
+    max_connections=50, max_keepalive_connections=20, keepalive_expiry=60
+)
+
+# HTTP/2 needs the optional 'h2' package; multiplex over one connection when present
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# With aiohttp installed the SDK routes async calls through aiohttp instead of
+# httpx, and httpx-only arguments would be rejected there.
+_AIOHTTP_AVAILABLE = importlib.util.find_spec("aiohttp") is not None
+
+
+def _http_options() -> types.HttpOptions:
+    """Pooled, keep-alive transport settings for the sync and async clients."""
+    client_args = {"limits": KEEPALIVE_LIMITS, "http2": HTTP2_AVAILABLE}
+    async_client_args = None if _AIOHTTP_AVAILABLE else dict(client_args)
+    return types.HttpOptions(
+        client_args=client_args, async_client_args=async_client_args
+    )
+
+
+@lru_cache(maxsize=None)
+def get_vertex_client(project: Optional[str], location: Optional[str]) -> genai.Client:
+    """
+    Return a Vertex AI client for the given project/location.
+    Reusing the client keeps auth tokens and HTTP connections warm.
+    """
+    return genai.Client(
+        vertexai=True,
+        project=project,
+        location=location,
+        http_options=_http_options(),
+    )
+
+
+@lru_cache(maxsize=None)
+def get_api_key_client(api_key: str) -> genai.Client:
+    """Return a Gemini API client for the given API key."""
+    return genai.Client(api_key=api_key, http_options=_http_options())
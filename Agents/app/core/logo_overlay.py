@@ -3,6 +3,7 @@ Logo overlay system with 4-corner positioning and drinkaware auto-apply
 """
 from PIL import Image
 import io
+from functools import lru_cache
 from pathlib import Path
 from typing import Tuple
 
@@ -32,6 +33,25 @@ def get_opposite_corner(position: str) -> str:
     return mapping.get(position, "bottom-left")
 
 
+@lru_cache(maxsize=16)
+def _load_resized_logo(path: str, mtime: float, width: int, min_height: int = 0) -> Image.Image:
+    """
+    Load a logo file and resize it to the given width, keeping aspect ratio.
+    Keyed on mtime so a replaced logo file is picked up; callers must not modify the result.
+    """
+    logo = Image.open(path)
+    if logo.mode != "RGBA":
+        logo = logo.convert("RGBA")
+    aspect = logo.height / logo.width
+    height = max(int(width * aspect), min_height)
+    return logo.resize((width, height), Image.LANCZOS)
+
+
+def _get_logo(path: Path, width: int, min_height: int = 0) -> Image.Image:
+    """Resized logo, decoded once per file version"""
+    return _load_resized_logo(str(path), path.stat().st_mtime, width, min_height)
+
+
 def add_logos(img: Image.Image, is_alcohol: bool, logo_position: str) -> Image.Image:
     """
     Add Tesco logo and drinkaware (if alcohol) with 4-corner positioning.
@@ -43,10 +63,8 @@ def add_logos(img: Image.Image, is_alcohol: bool, logo_position: str) -> Image.I
     # Add Tesco logo
     if tesco_logo_path.exists():
         try:
-            tesco_logo = Image.open(tesco_logo_path).convert("RGBA")
             # Resize to ~100px wide
-            aspect = tesco_logo.height / tesco_logo.width
-            tesco_logo = tesco_logo.resize((100, int(100 * aspect)), Image.LANCZOS)
+            tesco_logo = _get_logo(tesco_logo_path, 100)
             
             pos = get_logo_position(
                 img.width, img.height,
@@ -65,12 +83,8 @@ def add_logos(img: Image.Image, is_alcohol: bool, logo_position: str) -> Image.I
     # Add drinkaware logo if alcohol
     if is_alcohol and drinkaware_logo_path.exists():
         try:
-            drinkaware = Image.open(drinkaware_logo_path).convert("RGBA")
             # Resize to ~80px wide (min 20px height per compliance)
-            aspect = drinkaware.height / drinkaware.width
-            new_width = 80
-            new_height = max(int(new_width * aspect), 20)  # Ensure min 20px height
-            drinkaware = drinkaware.resize((new_width, new_height), Image.LANCZOS)
+            drinkaware = _get_logo(drinkaware_logo_path, 80, min_height=20)
             
             # Place at opposite corner
             opposite_pos = get_opposite_corner(logo_position)
@@ -87,8 +101,12 @@ def add_logos(img: Image.Image, is_alcohol: bool, logo_position: str) -> Image.I
     
     # Convert back to RGB
     if img.mode == 'RGBA':
+        alpha = img.getchannel('A')
+        # Fully opaque: compositing onto white is a no-op, just drop the band
+        if alpha.getextrema() == (255, 255):
+            return img.convert('RGB')
         rgb_img = Image.new('RGB', img.size, (255, 255, 255))
-        rgb_img.paste(img, mask=img.split()[3])
+        rgb_img.paste(img, mask=alpha)
         return rgb_img
     
     return img
@@ -10,6 +10,8 @@ Generates multiple placement candidates using different strategies:
 Design principle: ANALYZE SPACE FIRST, then generate candidates in viable areas.
 """
 
+import heapq
+from operator import attrgetter
 from typing import List, Tuple
 from app.core.spatial_grid import SpatialGrid, Element, Rectangle
 from app.core.placement_constraints import ConstraintScorer, PlacementCandidate
@@ -105,9 +107,9 @@ class CandidateGenerator:
             scored.method = candidate.method  # Preserve generation method
             scored_candidates.append(scored)
         
-        # Sort by score (highest first) and limit
-        scored_candidates.sort(reverse=True, key=lambda c: c.score)
-        return scored_candidates[:max_candidates]
+        # Top candidates by score (highest first) - same order as a stable
+        # reverse sort + slice, without sorting the whole list
+        return heapq.nlargest(max_candidates, scored_candidates, key=attrgetter("score"))
     
     def _generate_grid_based(self, width: float, height: float, 
                             element_type: str, grid_step: int = 80) -> List[PlacementCandidate]:
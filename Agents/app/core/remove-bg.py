@@ -1,4 +1,4 @@
-from rembg import remove
+from app.core.background_removal import remove_background_bytes
 import os
 
 def remove_background_service(input_path: str, output_path: str) -> bool:
@@ -7,7 +7,7 @@ def remove_background_service(input_path: str, output_path: str) -> bool:
         with open(input_path, "rb") as input_file:
             input_data = input_file.read()
         
-        output_data = remove(input_data)
+        output_data = remove_background_bytes(input_data)
         
         # Save the result
         with open(output_path, "wb") as output_file:
@@ -3,6 +3,7 @@ Smart text overlay system with intelligent contrast detection and sizing
 """
 from PIL import Image, ImageDraw, ImageFont, ImageFilter
 import io
+import numpy as np
 from typing import Tuple, Dict
 from .models import GenerationRequest
 
@@ -26,9 +27,9 @@ def calculate_optimal_text_color(image_bytes: bytes) -> str:
     sample_region = img.crop((0, 0, img.width, 300))
     
     # Convert to grayscale and calculate average luminance
+    # (one vectorized reduction instead of a Python list of every pixel)
     gray = sample_region.convert('L')
-    pixels = list(gray.getdata())
-    avg_luminance = sum(pixels) / len(pixels)
+    avg_luminance = np.asarray(gray).mean()
     
     # Return contrasting color (WCAG AA compliant)
     if avg_luminance < 128:
@@ -85,12 +86,11 @@ def draw_text_with_stroke(draw: ImageDraw.ImageDraw, position: Tuple[int, int],
     draw.text(position, text, font=font, fill=fill)
 
 
-def add_text_overlay(image_bytes: bytes, request: GenerationRequest, 
-                     text_color: str) -> bytes:
+def draw_text_overlay(img: Image.Image, request: GenerationRequest,
+                      text_color: str) -> Image.Image:
     """
-    Add text overlays to generated image with smart positioning.
+    Draw the headline and subhead onto an image in place and return it.
     """
-    img = Image.open(io.BytesIO(image_bytes))
     draw = ImageDraw.Draw(img)
     
     # Calculate smart font sizes
@@ -121,10 +121,7 @@ def add_text_overlay(image_bytes: bytes, request: GenerationRequest,
         request.subhead, subhead_font, text_color
     )
     
-    # Convert back to bytes
-    output = io.BytesIO()
-    img.save(output, format='PNG')
-    return output.getvalue()
+    return img
 
 
 def get_style_prompt(style: str, concept: str) -> str:
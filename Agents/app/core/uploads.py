@@ -0,0 +1,46 @@
+"""
+Upload helpers shared by the image endpoints
+"""
+
+import os
+from typing import Optional
+
+from fastapi import HTTPException, UploadFile
+
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+
+def _max_upload_bytes() -> int:
+    """
+    Largest image upload accepted. Read per call rather than at import so a
+    MAX_UPLOAD_MB set in .env is seen once load_dotenv() has run.
+    """
+    return int(os.getenv("MAX_UPLOAD_MB", "20")) * 1024 * 1024
+
+
+def _too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"File too large (max {max_bytes // (1024 * 1024)} MB)",
+    )
+
+
+async def read_upload(file: UploadFile, max_bytes: Optional[int] = None) -> bytes:
+    """
+    Read an uploaded file in 1 MB chunks.
+    Rejects it with 413 as soon as it is known to exceed max_bytes, before
+    the rest of it is buffered.
+    """
+    if max_bytes is None:
+        max_bytes = _max_upload_bytes()
+    if file.size is not None and file.size > max_bytes:
+        raise _too_large(max_bytes)
+
+    chunks = []
+    total = 0
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        total += len(chunk)
+        if total > max_bytes:
+            raise _too_large(max_bytes)
+        chunks.append(chunk)
+    return b"".join(chunks)
@@ -2,10 +2,11 @@
 AI-powered compliance validation using Gemini guardrails
 """
 
-from google import genai
 from google.genai import types
 from fastapi import HTTPException
+from .genai_clients import get_vertex_client
 from .models import GenerationRequest
+from functools import lru_cache
 import json
 import os
 
@@ -14,13 +15,13 @@ PROJECT_ID = os.getenv("GCP_PROJECT_ID")
 LOCATION = os.getenv("GCP_LOCATION")
 
 
-def validate_with_gemini_guardrail(request: GenerationRequest):
+@lru_cache(maxsize=128)
+def _gemini_guardrail_verdict(text: str) -> str:
     """
-    Use Gemini AI to detect compliance violations.
-    Hard blocks generation if critical violations found.
+    Ask Gemini for a compliance verdict on the banner text.
+    Returns the raw JSON so every caller parses its own mutable copy;
+    repeated copy is answered from cache, failures are not cached.
     """
-    text = f"Headline: {request.headline}\nSubhead: {request.subhead}"
-
     prompt = f"""
 You are a Tesco compliance validator. Analyze this banner text for violations:
 
@@ -42,16 +43,28 @@ Return ONLY valid JSON in this exact format:
 }}
 """
 
-    try:
-        client = genai.Client(vertexai=True, project=PROJECT_ID, location=LOCATION)
+    client = get_vertex_client(PROJECT_ID, LOCATION)
+
+    response = client.models.generate_content(
+        model="gemini-2.5-flash",
+        contents=prompt,
+        config=types.GenerateContentConfig(response_mime_type="application/json"),
+    )
+
+    # Validate before caching so a malformed reply is retried next time
+    json.loads(response.text)
+    return response.text
 
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=prompt,
-            config=types.GenerateContentConfig(response_mime_type="application/json"),
-        )
 
-        result = json.loads(response.text)
+def validate_with_gemini_guardrail(request: GenerationRequest):
+    """
+    Use Gemini AI to detect compliance violations.
+    Hard blocks generation if critical violations found.
+    """
+    text = f"Headline: {request.headline}\nSubhead: {request.subhead}"
+
+    try:
+        result = json.loads(_gemini_guardrail_verdict(text))
 
     except Exception as e:
         # Fallback to basic keyword check if Gemini fails
@@ -4,23 +4,34 @@ from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional
 
-# from rembg import remove  # Moved inside endpoint to prevent startup hang
-from PIL import Image
+from PIL import ExifTags, Image
+import asyncio
 import io
 import base64
 import json
 import logging
 import os
+import threading
+from app.core.background_removal import (
+    cache_cutout,
+    get_cached_cutout,
+    image_digest,
+    run_rembg,
+)
+from app.core.genai_clients import get_vertex_client
 from app.core.models import ValidationRequest, ValidationResponse
+from app.core.uploads import read_upload
 from app.core.prompts import COMPLIANCE_SYSTEM_PROMPT
 from app.routers import headline_routes  # NEW: Headline generator routes
 from app.routers import validate  # NEW: Validation and auto-fix routes
-from google import genai
 from google.genai import types
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Load all Pillow codec plugins at startup so the first upload doesn't pay for it
+Image.init()
+
 app = FastAPI(title="Agent API")
 
 # Register headline routes
@@ -49,6 +60,62 @@ async def health_check():
     return {"status": "healthy"}
 
 
+# Resize large images to prevent ONNX memory allocation errors
+CUTOUT_MAX_SIZE = 1024  # Reduced to 1024px to prevent memory issues
+
+
+def _cut_out_product(input_data: bytes) -> bytes:
+    """Downscale the upload, remove its background and return PNG bytes."""
+    MAX_SIZE = CUTOUT_MAX_SIZE
+    print("[AGENT DEBUG] Checking image dimensions...")
+    img = Image.open(io.BytesIO(input_data))
+    original_size = img.size
+    original_mode = img.mode
+    print(
+        f"[AGENT DEBUG] Original image size: {original_size}, mode: {original_mode}"
+    )
+
+    # Always resize to be safe - rembg works best with smaller images
+    if max(img.size) > MAX_SIZE:
+        print(
+            f"[AGENT DEBUG] Image too large ({max(img.size)}px), resizing to max {MAX_SIZE}px..."
+        )
+        img.thumbnail((MAX_SIZE, MAX_SIZE), Image.Resampling.BICUBIC)
+        print(f"[AGENT DEBUG] Resized to: {img.size}")
+
+    # Convert to RGB if needed (rembg handles RGBA output)
+    if img.mode not in ("RGB", "RGBA"):
+        print(f"[AGENT DEBUG] Converting from {img.mode} to RGB...")
+        img = img.convert("RGB")
+
+    # Remove background using rembg
+    # The decoded image is handed over directly - re-encoding it to PNG
+    # only for rembg to decode it again wasted a full codec round-trip.
+    # rembg rotates PIL input by its EXIF orientation. The PNG it used to be
+    # handed carried no EXIF, so drop the tag to keep the cut-out as before
+    img.getexif().pop(ExifTags.Base.Orientation, None)
+    img.info.pop("exif", None)
+
+    print("[AGENT DEBUG] Starting rembg background removal...")
+    print(
+        "[AGENT DEBUG] This may take 10-30 seconds for first run (model loading)..."
+    )
+    output_img = run_rembg(img)
+
+    # Close image to free memory
+    img.close()
+
+    # Encode the cut-out once, as PNG to keep the alpha channel
+    img_byte_arr = io.BytesIO()
+    output_img.save(img_byte_arr, format="PNG")
+    output_img.close()
+    output_data = img_byte_arr.getvalue()
+    print(
+        f"[AGENT DEBUG] Background removal complete! Output size: {len(output_data)} bytes"
+    )
+    return output_data
+
+
 # Remove Background Endpoint
 @app.post("/remove-bg")
 async def remove_background(file: UploadFile = File(...)):
@@ -71,59 +138,22 @@ async def remove_background(file: UploadFile = File(...)):
             raise HTTPException(status_code=400, detail="File must be an image")
 
         print(f"[AGENT DEBUG] Reading {file.filename} data...")
-        input_data = await file.read()
+        input_data = await read_upload(file)
         print(f"[AGENT DEBUG] File size: {len(input_data)} bytes")
         logger.info(
             f"[AGENT] Processing image: {file.filename}, size: {len(input_data)} bytes"
         )
 
-        # Resize large images to prevent ONNX memory allocation errors
-        MAX_SIZE = 1024  # Reduced to 1024px to prevent memory issues
-        print("[AGENT DEBUG] Checking image dimensions...")
-        img = Image.open(io.BytesIO(input_data))
-        original_size = img.size
-        original_mode = img.mode
-        print(
-            f"[AGENT DEBUG] Original image size: {original_size}, mode: {original_mode}"
-        )
-
-        # Always resize to be safe - rembg works best with smaller images
-        if max(img.size) > MAX_SIZE:
-            print(
-                f"[AGENT DEBUG] Image too large ({max(img.size)}px), resizing to max {MAX_SIZE}px..."
-            )
-            img.thumbnail((MAX_SIZE, MAX_SIZE), Image.LANCZOS)
-            print(f"[AGENT DEBUG] Resized to: {img.size}")
-
-        # Convert to RGB if needed (rembg handles RGBA output)
-        if img.mode not in ("RGB", "RGBA"):
-            print(f"[AGENT DEBUG] Converting from {img.mode} to RGB...")
-            img = img.convert("RGB")
-
-        # Convert back to bytes
-        img_byte_arr = io.BytesIO()
-        save_format = (
-            "PNG" if img.mode == "RGBA" else "PNG"
-        )  # Always use PNG for quality
-        img.save(img_byte_arr, format=save_format, optimize=True)
-        input_data = img_byte_arr.getvalue()
-        print(f"[AGENT DEBUG] Processed image size: {len(input_data)} bytes")
-
-        # Close image to free memory
-        img.close()
-
-        # Remove background using rembg
-        print("[AGENT DEBUG] Starting rembg background removal...")
-        print("[AGENT DEBUG] Loading rembg (this may take a moment)...")
-        from rembg import remove
-
-        print(
-            "[AGENT DEBUG] This may take 10-30 seconds for first run (model loading)..."
-        )
-        output_data = remove(input_data)
-        print(
-            f"[AGENT DEBUG] Background removal complete! Output size: {len(output_data)} bytes"
-        )
+        # Same upload again (re-add, undo/redo) - reuse the previous cut-out.
+        # Keyed apart from remove_background_bytes, which caches full-size cut-outs
+        cache_key = f"{image_digest(input_data)}:max{CUTOUT_MAX_SIZE}"
+        output_data = get_cached_cutout(cache_key)
+        if output_data is not None:
+            print("[AGENT DEBUG] Cut-out served from cache")
+        else:
+            # rembg is CPU-bound - keep it off the event loop
+            output_data = await asyncio.to_thread(_cut_out_product, input_data)
+            cache_cutout(cache_key, output_data)
 
         # Encode to base64
         print("[AGENT DEBUG] Encoding output to base64...")
@@ -193,8 +223,11 @@ async def generate_variations(req: VariationsRequest):
             print(
                 f"[AGENT DEBUG] Calling generate_variations_from_bytes with concept: {req.concept}"
             )
-            variations = generate_variations_from_bytes(
-                image_bytes, req.concept or "product photography"
+            # Image prep and the Gemini calls block - keep them off the event loop
+            variations = await asyncio.to_thread(
+                generate_variations_from_bytes,
+                image_bytes,
+                req.concept or "product photography",
             )
             print(f"[AGENT DEBUG] AI service returned: {type(variations)}")
 
@@ -260,7 +293,10 @@ async def generate_variations_stream(req: VariationsRequest):
     async def event_generator():
         print("[AGENT] 📡 SSE event_generator started")
         try:
-            from app.core.ai_service import generate_single_variation
+            from app.core.ai_service import (
+                generate_single_variation,
+                prepare_variation_input,
+            )
             import base64 as b64
 
             image_bytes = b64.b64decode(req.image_data)
@@ -274,21 +310,62 @@ async def generate_variations_stream(req: VariationsRequest):
 
             styles = ["studio", "lifestyle", "creative"]
 
-            for i, style in enumerate(styles):
-                print(f"\n[AGENT] === VARIATION {i + 1}/3 ({style}) ===")
-
-                # Send progress event
-                progress_event = f"data: {json.dumps({'type': 'progress', 'index': i, 'style': style})}\n\n"
-                print(f"[AGENT] 📤 Sending PROGRESS event")
-                yield progress_event
-
+            # Decode and downscale the product once; every style sends the same JPEG
+            try:
+                product_bytes = await asyncio.to_thread(prepare_variation_input, image_bytes)
+            except Exception as e:
+                # Every style would have failed on this image - report it per
+                # style, as the client only surfaces errors that carry an index
+                print(f"[AGENT] ❌ Could not prepare product image: {e}")
+                for i in range(len(styles)):
+                    yield f"data: {json.dumps({'type': 'error', 'index': i, 'message': str(e)})}\n\n"
+                yield f"data: {json.dumps({'type': 'complete'})}\n\n"
+                return
+
+            # Set when the stream ends early (client gone) so styles still
+            # waiting for their slot or retrying skip their Gemini calls
+            cancelled = threading.Event()
+
+            async def run_variation(i: int, style: str):
+                # Each style is an independent Gemini call; run them side by side
+                # (staggered starts, 429 backoff) so the stream finishes in
+                # ~max(call) instead of sum(calls).
                 try:
-                    print(
-                        f"[AGENT] 🎨 Calling generate_single_variation for {style}..."
+                    variation = await asyncio.to_thread(
+                        generate_single_variation,
+                        image_bytes,
+                        concept,
+                        style,
+                        product_bytes,
+                        i,
+                        cancelled,
                     )
-                    variation = generate_single_variation(image_bytes, concept, style)
+                    return i, variation, None
+                except Exception as e:
+                    return i, None, e
 
-                    if variation:
+            tasks = []
+            try:
+                for i, style in enumerate(styles):
+                    print(f"\n[AGENT] === VARIATION {i + 1}/3 ({style}) ===")
+
+                    # Send progress event
+                    progress_event = f"data: {json.dumps({'type': 'progress', 'index': i, 'style': style})}\n\n"
+                    print(f"[AGENT] 📤 Sending PROGRESS event")
+                    yield progress_event
+
+                    print(f"[AGENT] 🎨 Calling generate_single_variation for {style}...")
+                    tasks.append(asyncio.create_task(run_variation(i, style)))
+
+                # Variations are sent in completion order; the client keys them by index
+                for next_done in asyncio.as_completed(tasks):
+                    i, variation, error = await next_done
+
+                    if error is not None:
+                        print(f"[AGENT] ❌ Error generating variation {i + 1}: {error}")
+                        error_event = f"data: {json.dumps({'type': 'error', 'index': i, 'message': str(error)})}\n\n"
+                        yield error_event
+                    elif variation:
                         print(
                             f"[AGENT] ✅ Variation {i + 1} generated! Length: {len(variation)}"
                         )
@@ -302,11 +379,11 @@ async def generate_variations_stream(req: VariationsRequest):
                         print(f"[AGENT] ❌ Variation {i + 1} returned empty!")
                         error_event = f"data: {json.dumps({'type': 'error', 'index': i, 'message': 'Empty result'})}\n\n"
                         yield error_event
-
-                except Exception as e:
-                    print(f"[AGENT] ❌ Error generating variation {i + 1}: {e}")
-                    error_event = f"data: {json.dumps({'type': 'error', 'index': i, 'message': str(e)})}\n\n"
-                    yield error_event
+            finally:
+                # Runs on disconnect too: stop the styles that are still pending
+                cancelled.set()
+                for task in tasks:
+                    task.cancel()
 
             complete_event = f"data: {json.dumps({'type': 'complete'})}\n\n"
             print(f"[AGENT] 📤 Sending COMPLETE event")
@@ -351,11 +428,7 @@ async def validate_canvas(req: ValidationRequest) -> ValidationResponse:
         print(f"[AGENT] Decoded canvas content: {len(canvas_content)} chars")
 
         # 2. Call Gemini for validation & correction
-        client = genai.Client(
-            vertexai=True,
-            project=os.getenv("GCP_PROJECT_ID"),
-            location=os.getenv("GCP_LOCATION"),
-        )
+        client = get_vertex_client(os.getenv("GCP_PROJECT_ID"), os.getenv("GCP_LOCATION"))
 
         prompt = f"{COMPLIANCE_SYSTEM_PROMPT}\n\nCanvas HTML/CSS:\n{canvas_content}"
 
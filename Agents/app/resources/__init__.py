@@ -0,0 +1,3 @@
+"""
+Static resources for the agents: system prompt, ruleset and validation rules
+"""
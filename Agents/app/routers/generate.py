@@ -2,6 +2,7 @@ from fastapi import APIRouter, HTTPException, File, UploadFile
 from pydantic import BaseModel
 from typing import Optional
 from app.core.ai_service import generate_variations_from_bytes
+import asyncio
 import base64
 
 router = APIRouter(prefix="/generate")
@@ -25,7 +26,9 @@ async def create_variations(req: VariationsRequest):
         image_bytes = base64.b64decode(req.image_data)
         
         # Generate variations (returns list of base64 strings)
-        variations = generate_variations_from_bytes(image_bytes, req.concept or "product photography")
+        variations = await asyncio.to_thread(
+            generate_variations_from_bytes, image_bytes, req.concept or "product photography"
+        )
         
         if not variations:
             raise HTTPException(status_code=500, detail="AI generation returned no images.")
@@ -48,7 +51,7 @@ import os
 async def create_variations_legacy(req: GenerationRequest):
     """Legacy endpoint that uses file paths."""
     try:
-        file_paths = generate_variations(req.product_filename, req.concept)
+        file_paths = await asyncio.to_thread(generate_variations, req.product_filename, req.concept)
         
         if not file_paths:
             raise HTTPException(status_code=500, detail="AI generation returned no images.")
@@ -16,7 +16,6 @@ from fastapi import APIRouter, HTTPException, Request
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel, ValidationError, Field, field_validator
 from typing import List, Optional
-from google import genai
 from google.genai import types
 import os
 
@@ -24,6 +23,7 @@ import os
 from app.core.spatial_grid import SpatialGrid, Rectangle
 from app.core.placement_constraints import ConstraintScorer
 from app.core.placement_generator import CandidateGenerator
+from app.core.genai_clients import get_vertex_client
 
 router = APIRouter(prefix="/placement", tags=["placement"])
 
@@ -31,11 +31,7 @@ router = APIRouter(prefix="/placement", tags=["placement"])
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", os.getenv("GOOGLE_API_KEY", ""))
 model = None
 try:
-    client = genai.Client(
-        vertexai=True,
-        project=os.getenv("GCP_PROJECT_ID"),
-        location=os.getenv("GCP_LOCATION")
-    )
+    client = get_vertex_client(os.getenv("GCP_PROJECT_ID"), os.getenv("GCP_LOCATION"))
     model = client.models
 except Exception as e:
     print(f"⚠️ [PLACEMENT] Gemini client init failed: {e}")
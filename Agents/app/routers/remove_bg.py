@@ -1,8 +1,10 @@
+import asyncio
 from fastapi import APIRouter, File, UploadFile, HTTPException, Body
 from pydantic import BaseModel
 import uuid
 from pathlib import Path
-from rembg import remove
+from app.core.background_removal import remove_background_bytes
+from app.core.uploads import read_upload
 import base64
 
 router = APIRouter(prefix="/remove-bg")
@@ -23,18 +25,17 @@ async def remove_background(
     try:
         # Handle file path input (from Backend controller)
         if request and request.file_path:
-            with open(request.file_path, "rb") as f:
-                input_data = f.read()
+            input_data = await asyncio.to_thread(Path(request.file_path).read_bytes)
         # Handle direct file upload
         elif file:
             if not file.content_type.startswith("image/"):
                 raise HTTPException(status_code=400, detail="File must be an image")
-            input_data = await file.read()
+            input_data = await read_upload(file)
         else:
             raise HTTPException(status_code=400, detail="Either file or file_path must be provided")
         
-        # Remove background using rembg
-        output_data = remove(input_data)
+        # Remove background using the shared rembg session, off the event loop
+        output_data = await asyncio.to_thread(remove_background_bytes, input_data)
         
         # Encode to base64
         base64_image = base64.b64encode(output_data).decode('utf-8')
@@ -45,6 +46,8 @@ async def remove_background(
             "format": "png"
         }
     
+    except HTTPException:
+        raise
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail="File not found")
     except Exception as e:
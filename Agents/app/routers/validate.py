@@ -6,23 +6,48 @@ from app.core.models import (
     AutoFixResponse,
     FixApplied,
 )
-from app.agents.runner import run_validation
+from app.agents.runner import get_hardcoded_positions, run_validation
 from app.services.validation_service import (
     prepare_html_for_llm,
     restore_html_from_llm,
     validate_html_structure,
 )
+import asyncio
 import base64
 import time
 import json
 import logging
 import os
+import re
 from pathlib import Path
-from google import genai
 from google.genai import types
 
+from app.core.genai_clients import get_api_key_client, get_vertex_client
+
+try:
+    # Optional orjson: C parser for the (often tens of KB) auto-fix responses
+    import orjson
+except ImportError:
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
+# Markdown code fence the model sometimes wraps its JSON in
+_FENCE_RE = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$")
+
+
+def _loads_llm_json(text: str):
+    """Parse a model's JSON reply, ignoring a surrounding code fence"""
+    text = _FENCE_RE.sub("", text)
+    if orjson is not None:
+        try:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError:
+            # NaN / Infinity and friends - let json.loads have the final say
+            pass
+    return json.loads(text)
+
+
 router = APIRouter(prefix="/validate")
 
 # Load validation rules
@@ -37,6 +62,46 @@ MODEL_ID = os.getenv("GEMINI_MODEL_ID")
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 
 
+def _log_canvas_structure(decoded_canvas: str):
+    """Log a per-element summary of the canvas (debug only)"""
+    try:
+        canvas_json = json.loads(decoded_canvas)
+        width = canvas_json.get('width', 'unknown')
+        height = canvas_json.get('height', 'unknown')
+        objects = canvas_json.get('objects', [])
+        bg = canvas_json.get('background', 'unknown')
+
+        logger.debug(f"[VALIDATE] Canvas: {width}x{height}px, background: {bg}")
+        logger.debug(f"[VALIDATE] Objects: {len(objects)} elements")
+
+        # Log element summary with custom properties
+        for i, obj in enumerate(objects[:10]):  # Limit to first 10
+            obj_type = obj.get('type', 'unknown')
+            custom_id = obj.get('customId', '')
+            is_tesco_tag = obj.get('isTescoTag', False)
+            is_logo = obj.get('isLogo', False)
+
+            if obj_type in ['text', 'textbox', 'i-text']:
+                text = (obj.get('text') or '')[:40]
+                font_size = obj.get('fontSize', 16)
+                logger.debug(f"  [{i}] TEXT: '{text}' ({font_size}px) {f'[{custom_id}]' if custom_id else ''}")
+            elif obj_type == 'image':
+                src = (obj.get('src') or '')[:50]
+                flags = []
+                if is_tesco_tag: flags.append('TESCO_TAG')
+                if is_logo: flags.append('LOGO')
+                if custom_id: flags.append(f'id:{custom_id}')
+                logger.debug(f"  [{i}] IMAGE: {src[:30] if src else '(no src)'}... {' '.join(flags)}")
+            else:
+                logger.debug(f"  [{i}] {obj_type.upper()} {f'[{custom_id}]' if custom_id else ''}")
+
+        if len(objects) > 10:
+            logger.debug(f"  ... and {len(objects) - 10} more elements")
+
+    except json.JSONDecodeError:
+        logger.warning("[VALIDATE] Could not parse canvas as JSON")
+
+
 @router.post("")
 async def validate(req: ValidationRequest) -> ValidationResponse:
     """
@@ -50,43 +115,10 @@ async def validate(req: ValidationRequest) -> ValidationResponse:
         decoded_canvas = base64.b64decode(req.canvas).decode("utf-8")
         logger.info(f"[VALIDATE] Decoded canvas size: {len(decoded_canvas)} chars")
         
-        # Try to parse and log canvas structure for debugging
-        try:
-            canvas_json = json.loads(decoded_canvas)
-            width = canvas_json.get('width', 'unknown')
-            height = canvas_json.get('height', 'unknown')
-            objects = canvas_json.get('objects', [])
-            bg = canvas_json.get('background', 'unknown')
-            
-            logger.info(f"[VALIDATE] Canvas: {width}x{height}px, background: {bg}")
-            logger.info(f"[VALIDATE] Objects: {len(objects)} elements")
-            
-            # Log element summary with custom properties
-            for i, obj in enumerate(objects[:10]):  # Limit to first 10
-                obj_type = obj.get('type', 'unknown')
-                custom_id = obj.get('customId', '')
-                is_tesco_tag = obj.get('isTescoTag', False)
-                is_logo = obj.get('isLogo', False)
-                
-                if obj_type in ['text', 'textbox', 'i-text']:
-                    text = (obj.get('text') or '')[:40]
-                    font_size = obj.get('fontSize', 16)
-                    logger.info(f"  [{i}] TEXT: '{text}' ({font_size}px) {f'[{custom_id}]' if custom_id else ''}")
-                elif obj_type == 'image':
-                    src = (obj.get('src') or '')[:50]
-                    flags = []
-                    if is_tesco_tag: flags.append('TESCO_TAG')
-                    if is_logo: flags.append('LOGO')
-                    if custom_id: flags.append(f'id:{custom_id}')
-                    logger.info(f"  [{i}] IMAGE: {src[:30] if src else '(no src)'}... {' '.join(flags)}")
-                else:
-                    logger.info(f"  [{i}] {obj_type.upper()} {f'[{custom_id}]' if custom_id else ''}")
-            
-            if len(objects) > 10:
-                logger.info(f"  ... and {len(objects) - 10} more elements")
-                
-        except json.JSONDecodeError:
-            logger.warning("[VALIDATE] Could not parse canvas as JSON")
+        # Parsing the canvas just to log its structure is a second full JSON
+        # parse per request - only pay for it when debug logging is on
+        if logger.isEnabledFor(logging.DEBUG):
+            _log_canvas_structure(decoded_canvas)
     except Exception as e:
         logger.error(f"[VALIDATE] Failed to decode canvas: {e}")
         decoded_canvas = req.canvas
@@ -104,13 +136,13 @@ async def validate(req: ValidationRequest) -> ValidationResponse:
     logger.info(f"[VALIDATE] Completed in {end - start:.4f}s")
     
     # Print HTML preview (first 2000 chars for readability)
-    if result.canvas:
-        logger.info(f"[VALIDATE] ========== HTML PREVIEW (first 2000 chars) ==========")
+    if result.canvas and logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"[VALIDATE] ========== HTML PREVIEW (first 2000 chars) ==========")
         preview = result.canvas[:2000] if len(result.canvas) > 2000 else result.canvas
         for line in preview.split('\n')[:50]:  # First 50 lines
-            logger.info(f"  {line}")
+            logger.debug(f"  {line}")
         if len(result.canvas) > 2000:
-            logger.info(f"  ... (truncated, total {len(result.canvas)} chars)")
+            logger.debug(f"  ... (truncated, total {len(result.canvas)} chars)")
     
     logger.info(f"[VALIDATE] ==========================================")
 
@@ -185,13 +217,13 @@ async def auto_fix_compliance(req: AutoFixRequest) -> AutoFixResponse:
                     if attempt < max_retries:
                         # Add validation feedback to prompt for next attempt
                         prompt += f"\n\n[RETRY {attempt}] Previous HTML was malformed. Ensure all tags are properly closed and nested."
-                        time.sleep(1)  # Rate limiting
+                        await asyncio.sleep(1)  # Rate limiting
 
             except Exception as e:
                 logger.error(f"❌ [AUTO-FIX] Attempt {attempt} failed: {e}")
                 if attempt == max_retries:
                     raise
-                time.sleep(1)
+                await asyncio.sleep(1)
 
         # Check if we got valid HTML
         if not corrected_html or not await validate_html_structure(corrected_html):
@@ -264,56 +296,11 @@ def _build_auto_fix_prompt(
     ]
 
     # === HARDCODED ELEMENT POSITIONS (SCALED TO CANVAS SIZE) ===
-    EDGE_PADDING = 20
-    
-    HARDCODED_POSITIONS = {
-        # Headlines - TOP LEFT area
-        "headline": {
-            "left": EDGE_PADDING,
-            "top": EDGE_PADDING,
-            "width": int(canvas_width * 0.6),  # 60% of canvas
-            "fontSize": max(36, int(canvas_height * 0.05)),  # 5% of height
-            "fontWeight": "bold",
-            "color": "#000000",
-            "textAlign": "left",
-            "fontFamily": "Arial, sans-serif"
-        },
-        # Subheadline - Below headline
-        "subheadline": {
-            "left": EDGE_PADDING,
-            "top": EDGE_PADDING + int(canvas_height * 0.08),  # Below headline
-            "width": int(canvas_width * 0.6),
-            "fontSize": max(22, int(canvas_height * 0.035)),
-            "fontWeight": "normal",
-            "color": "#000000",
-            "textAlign": "left",
-            "fontFamily": "Arial, sans-serif"
-        },
-        # Tesco Tag Sticker - Bottom left, BIG SIZE
-        "tesco_sticker": {
-            "left": EDGE_PADDING,
-            "top": canvas_height - 120,  # Near bottom
-            "width": max(200, int(canvas_width * 0.25)),  # 25% of width
-            "height": max(80, int(canvas_height * 0.12)),  # 12% of height
-        },
-        # Brand Logo - TOP RIGHT corner (when missing, add Tesco logo here)
-        "brand_logo": {
-            "left": canvas_width - 120,  # Right side
-            "top": EDGE_PADDING,  # Top right
-            "width": 100,
-            "height": 40,
-            "position": "top-right"
-        },
-        # Value Tile / Price Sticker - Bottom right corner, BIG
-        "value_tile": {
-            "left": canvas_width - 140,
-            "top": canvas_height - 140,
-            "width": max(120, int(canvas_width * 0.12)),
-            "height": max(120, int(canvas_height * 0.15)),
-        }
-    }
+    # Same table the validation rules use for their auto-fix hints
+    HARDCODED_POSITIONS = get_hardcoded_positions(canvas_width, canvas_height)
 
-    prompt = f"""You are a Tesco Retail Media compliance specialist. Fix the provided HTML/CSS to resolve compliance violations.
+    # Collect sections and join once - repeated += re-copies the whole prompt
+    parts = [f"""You are a Tesco Retail Media compliance specialist. Fix the provided HTML/CSS to resolve compliance violations.
 
 === CANVAS SPECIFICATIONS ===
 Width: {canvas_width}px
@@ -350,26 +337,26 @@ Height: {canvas_height}px
    - Size: width={HARDCODED_POSITIONS['value_tile']['width']}px, height={HARDCODED_POSITIONS['value_tile']['height']}px
 
 === VIOLATIONS DETECTED ({len(violations)}) ===
-"""
+"""]
 
     for i, violation in enumerate(violations, 1):
-        prompt += f"\n{i}. {violation.rule}: {violation.message}"
+        parts.append(f"\n{i}. {violation.rule}: {violation.message}")
         if violation.elementId:
-            prompt += f" (Element ID: {violation.elementId})"
+            parts.append(f" (Element ID: {violation.elementId})")
 
-    prompt += f"\n\n=== COMPLIANCE RULES ===\n"
+    parts.append("\n\n=== COMPLIANCE RULES ===\n")
 
     for rule in relevant_rules:
-        prompt += f"""
+        parts.append(f"""
 Rule: {rule["name"]} ({rule["id"]})
 Severity: {rule["severity"]}
 Description: {rule["description"]}
 Fix Instructions: {rule["fix_instruction"]}
 Example: {rule.get("example_fix", "N/A")}
 ---
-"""
+""")
 
-    prompt += f"""
+    parts.append(f"""
 
 === CURRENT HTML ===
 {html}
@@ -414,9 +401,9 @@ Return a JSON object with this exact structure:
 }}
 
 Begin correction now. USE THE EXACT POSITIONS I SPECIFIED!
-"""
+""")
 
-    return prompt
+    return "".join(parts)
 
 
 async def _call_gemini_for_fixes(prompt: str) -> dict:
@@ -426,11 +413,11 @@ async def _call_gemini_for_fixes(prompt: str) -> dict:
         # Use API key if available, otherwise fall back to Vertex AI (ADC)
         if GOOGLE_API_KEY:
             logger.info("🔑 [AUTO-FIX] Using Google API Key authentication")
-            client = genai.Client(api_key=GOOGLE_API_KEY)
+            client = get_api_key_client(GOOGLE_API_KEY)
             model_name = "gemini-2.5-flash"  # Consumer API model
         else:
             logger.info("☁️ [AUTO-FIX] Using Vertex AI authentication (ADC)")
-            client = genai.Client(vertexai=True, project=PROJECT_ID, location=LOCATION)
+            client = get_vertex_client(PROJECT_ID, LOCATION)
             model_name = MODEL_ID  # Use configured model for Vertex AI
 
         # Log the input prompt
@@ -441,7 +428,7 @@ async def _call_gemini_for_fixes(prompt: str) -> dict:
         logger.info("=" * 80)
         logger.info(f"🤖 [AUTO-FIX] Calling Gemini model: {model_name}")
 
-        response = client.models.generate_content(
+        response = await client.aio.models.generate_content(
             model=model_name,
             contents=prompt,
             config=types.GenerateContentConfig(
@@ -459,7 +446,7 @@ async def _call_gemini_for_fixes(prompt: str) -> dict:
         logger.info("=" * 80)
 
         # Parse JSON response
-        result = json.loads(response.text)
+        result = _loads_llm_json(response.text)
 
         logger.info(
             f"✨ [AUTO-FIX] Gemini returned {len(result.get('fixes', []))} fixes"
@@ -479,8 +466,6 @@ async def _call_gemini_for_fixes(prompt: str) -> dict:
         logger.error(f"Raw response text: {response.text[:500]}...")
         # Try to extract JSON from response
         try:
-            import re
-
             json_match = re.search(r"\{.*\}", response.text, re.DOTALL)
             if json_match:
                 return json.loads(json_match.group())
@@ -544,10 +529,10 @@ async def generate_content_for_fix(req: GenerateContentRequest) -> GenerateConte
         prompt = _build_content_generation_prompt(req.rule, headline_text, product_info)
         
         # Call Gemini to generate content
-        client = genai.Client(api_key=GOOGLE_API_KEY)
+        client = get_api_key_client(GOOGLE_API_KEY)
         model_name = "gemini-2.5-flash"
         
-        response = client.models.generate_content(
+        response = await client.aio.models.generate_content(
             model=model_name,
             contents=prompt,
             config=types.GenerateContentConfig(
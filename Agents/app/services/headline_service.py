@@ -3,16 +3,24 @@ Headline/Subheading Generator Service
 Uses Google Gemini Vision to analyze product images and generate Tesco brand-compliant headlines.
 """
 
+import asyncio
 import os
+import io
 import base64
+import copy
+import hashlib
 import json
 import logging
 import sys
+import time
+from collections import OrderedDict
 from datetime import datetime
 from typing import Optional
 from dotenv import load_dotenv
-from google import genai
 from google.genai import types
+from PIL import Image
+
+from app.core.genai_clients import get_api_key_client
 
 load_dotenv()
 
@@ -73,6 +81,20 @@ log_json(
 generation_counts = {}
 MAX_GENERATIONS_PER_DESIGN = 10
 
+# Longest edge sent to Gemini Vision - larger uploads only add tokens and upload time
+VISION_MAX_EDGE = 1024
+
+# Image analysis cache (placement, font style, keywords).
+# Re-analysing the same image returns the same answer, so skip the Gemini call.
+ANALYSIS_CACHE_TTL_SECONDS = 3600
+ANALYSIS_CACHE_MAX_ENTRIES = 64
+_analysis_cache: "OrderedDict[tuple, tuple[float, dict]]" = OrderedDict()
+
+# Decoded + downscaled image bytes, keyed by a hash of the base64 upload.
+# The editor sends the same packshot to keywords, headlines and subheadings.
+VISION_BYTES_CACHE_MAX_ENTRIES = 8
+_vision_bytes_cache: "OrderedDict[str, bytes]" = OrderedDict()
+
 # Tesco Brand Guidelines
 TESCO_BRAND_GUIDELINES = """
 Tesco Brand Voice Guidelines:
@@ -92,19 +114,11 @@ Avoid:
 
 
 def _init_gemini_client():
-    """Initialize Gemini client with API key"""
-    log_json(
-        "INFO",
-        "📦 Initializing Gemini client with API key...",
-        model=MODEL_ID,
-    )
-
+    """Get the shared Gemini client for the configured API key"""
     if not API_KEY:
         raise ValueError("GOOGLE_API_KEY is not set in environment variables")
 
-    client = genai.Client(api_key=API_KEY)
-    log_json("INFO", "✅ Gemini client initialized (API Key)")
-    return client
+    return get_api_key_client(API_KEY)
 
 
 def _check_rate_limit(design_id: str) -> bool:
@@ -124,8 +138,44 @@ def _check_rate_limit(design_id: str) -> bool:
     return True
 
 
-def _decode_base64_image(image_base64: str) -> bytes:
+def _analysis_cache_key(kind: str, image_base64: str, *extra) -> tuple:
+    """Build a cache key from the analysis kind, image hash and extra args"""
+    digest = hashlib.sha1(image_base64.encode("utf-8")).hexdigest()
+    return (kind, digest, *extra)
+
+
+def _analysis_cache_get(key: tuple) -> Optional[dict]:
+    """Return a cached analysis result, or None if missing/expired"""
+    entry = _analysis_cache.get(key)
+    if entry is None:
+        return None
+
+    stored_at, result = entry
+    if time.monotonic() - stored_at > ANALYSIS_CACHE_TTL_SECONDS:
+        del _analysis_cache[key]
+        return None
+
+    _analysis_cache.move_to_end(key)
+    return copy.deepcopy(result)
+
+
+def _analysis_cache_put(key: tuple, result: dict):
+    """Store an analysis result, evicting the least recently used entry"""
+    _analysis_cache[key] = (time.monotonic(), copy.deepcopy(result))
+    _analysis_cache.move_to_end(key)
+    while len(_analysis_cache) > ANALYSIS_CACHE_MAX_ENTRIES:
+        _analysis_cache.popitem(last=False)
+
+
+async def _decode_base64_image(image_base64: str) -> bytes:
     """Decode base64 image string to bytes"""
+    digest = hashlib.sha1(image_base64.encode("utf-8")).hexdigest()
+    cached = _vision_bytes_cache.get(digest)
+    if cached is not None:
+        _vision_bytes_cache.move_to_end(digest)
+        logger.info("⚡ [HEADLINE SERVICE] Reusing decoded image")
+        return cached
+
     logger.info("🖼️ [HEADLINE SERVICE] Decoding base64 image...")
 
     # Remove data URL prefix if present
@@ -134,9 +184,37 @@ def _decode_base64_image(image_base64: str) -> bytes:
 
     image_bytes = base64.b64decode(image_base64)
     logger.info(f"✅ [HEADLINE SERVICE] Image decoded: {len(image_bytes)} bytes")
+    image_bytes = await asyncio.to_thread(_downscale_for_vision, image_bytes)
+
+    _vision_bytes_cache[digest] = image_bytes
+    while len(_vision_bytes_cache) > VISION_BYTES_CACHE_MAX_ENTRIES:
+        _vision_bytes_cache.popitem(last=False)
     return image_bytes
 
 
+def _downscale_for_vision(image_bytes: bytes, max_edge: int = VISION_MAX_EDGE) -> bytes:
+    """Shrink the image so its longest edge is at most max_edge, as PNG"""
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            if max(img.size) <= max_edge:
+                return image_bytes
+
+            original_size = img.size
+            # JPEGs decode straight at a reduced scale instead of full size
+            img.draft("RGB", (max_edge, max_edge))
+            img.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+            output = io.BytesIO()
+            img.save(output, format="PNG")
+    except Exception as e:
+        logger.warning(f"⚠️ [HEADLINE SERVICE] Could not downscale image: {e}")
+        return image_bytes
+
+    logger.info(
+        f"📐 [HEADLINE SERVICE] Downscaled image {original_size} -> {img.size}"
+    )
+    return output.getvalue()
+
+
 async def suggest_keywords(image_base64: str) -> dict:
     """
     Analyze product image and suggest relevant keywords.
@@ -144,9 +222,15 @@ async def suggest_keywords(image_base64: str) -> dict:
     """
     logger.info("🔍 [HEADLINE SERVICE] suggest_keywords called")
 
+    cache_key = _analysis_cache_key("keywords", image_base64)
+    cached = _analysis_cache_get(cache_key)
+    if cached is not None:
+        logger.info("⚡ [HEADLINE SERVICE] Keywords served from cache")
+        return cached
+
     try:
         client = _init_gemini_client()
-        image_bytes = _decode_base64_image(image_base64)
+        image_bytes = await _decode_base64_image(image_base64)
 
         prompt = """Analyze this product image and suggest 5-7 relevant marketing keywords.
         
@@ -162,7 +246,7 @@ async def suggest_keywords(image_base64: str) -> dict:
 
         logger.info("📤 [HEADLINE SERVICE] Sending keyword request to Gemini...")
 
-        response = client.models.generate_content(
+        response = await client.aio.models.generate_content(
             model=MODEL_ID,
             contents=[
                 types.Content(
@@ -189,7 +273,9 @@ async def suggest_keywords(image_base64: str) -> dict:
 
         logger.info(f"✅ [HEADLINE SERVICE] Keywords extracted: {keywords}")
 
-        return {"success": True, "keywords": keywords}
+        result = {"success": True, "keywords": keywords}
+        _analysis_cache_put(cache_key, result)
+        return result
 
     except Exception as e:
         logger.error(f"❌ [HEADLINE SERVICE] Keyword suggestion failed: {str(e)}")
@@ -224,7 +310,7 @@ async def generate_headlines(
 
     try:
         client = _init_gemini_client()
-        image_bytes = _decode_base64_image(image_base64)
+        image_bytes = await _decode_base64_image(image_base64)
 
         # Build context
         context_parts = []
@@ -259,7 +345,7 @@ Return ONLY a JSON array with 3 headlines:
 
         logger.info("📤 [HEADLINE SERVICE] Sending headline request to Gemini...")
 
-        response = client.models.generate_content(
+        response = await client.aio.models.generate_content(
             model=MODEL_ID,
             contents=[
                 types.Content(
@@ -320,7 +406,7 @@ async def generate_subheadings(
 
     try:
         client = _init_gemini_client()
-        image_bytes = _decode_base64_image(image_base64)
+        image_bytes = await _decode_base64_image(image_base64)
 
         # Build context
         context_parts = []
@@ -356,7 +442,7 @@ Return ONLY a JSON array with 3 subheadings:
 
         logger.info("📤 [HEADLINE SERVICE] Sending subheading request to Gemini...")
 
-        response = client.models.generate_content(
+        response = await client.aio.models.generate_content(
             model=MODEL_ID,
             contents=[
                 types.Content(
@@ -413,9 +499,17 @@ async def analyze_image_for_placement(
         canvas_height=canvas_height,
     )
 
+    cache_key = _analysis_cache_key(
+        "placement", image_base64, canvas_width, canvas_height
+    )
+    cached = _analysis_cache_get(cache_key)
+    if cached is not None:
+        log_json("INFO", "⚡ Smart placement served from cache")
+        return cached
+
     try:
         client = _init_gemini_client()
-        image_bytes = _decode_base64_image(image_base64)
+        image_bytes = await _decode_base64_image(image_base64)
 
         prompt = f"""You are an expert graphic designer analyzing this retail advertisement image for optimal text placement.
 
@@ -480,7 +574,7 @@ CRITICAL RULES:
 
         log_json("INFO", "📤 Sending smart placement request to Gemini...")
 
-        response = client.models.generate_content(
+        response = await client.aio.models.generate_content(
             model=MODEL_ID,
             contents=[
                 types.Content(
@@ -513,7 +607,9 @@ CRITICAL RULES:
                 background=placement.get("background_brightness"),
             )
 
-            return {"success": True, "placement": placement}
+            result = {"success": True, "placement": placement}
+            _analysis_cache_put(cache_key, result)
+            return result
         else:
             # Fallback to safe defaults
             return _get_default_placement(canvas_width, canvas_height)
@@ -676,9 +772,15 @@ async def analyze_font_style(image_base64: str) -> dict:
     """
     log_json("INFO", "🎨 Analyzing image for font style recommendation...")
 
+    cache_key = _analysis_cache_key("font_style", image_base64)
+    cached = _analysis_cache_get(cache_key)
+    if cached is not None:
+        log_json("INFO", "⚡ Font style served from cache")
+        return cached
+
     try:
         client = _init_gemini_client()
-        image_bytes = _decode_base64_image(image_base64)
+        image_bytes = await _decode_base64_image(image_base64)
 
         prompt = f"""Analyze this retail product image and recommend typography styling.
 
@@ -705,7 +807,7 @@ Letter spacing: tight, normal, wide, extraWide
 Text transform: none, uppercase, capitalize
 """
 
-        response = client.models.generate_content(
+        response = await client.aio.models.generate_content(
             model=MODEL_ID,
             contents=[
                 types.Content(
@@ -742,7 +844,9 @@ Text transform: none, uppercase, capitalize
                 weight=font_style.get("fontWeight"),
             )
 
-            return {"success": True, "fontStyle": font_style}
+            result = {"success": True, "fontStyle": font_style}
+            _analysis_cache_put(cache_key, result)
+            return result
         else:
             return _get_default_font_style()
 